@@ -2,47 +2,17 @@ import streamlit as st
 import time
 import pandas as pd
 import os, datetime
-import re
-
-from src.ingest import chunk_text
-from src.retrieval import retrieve
-from src.reasoning import classify, decide, confidence_score
+import hashlib
+import json
+
+from src.ingest import chunk_text, chunk_params
+from src.retrieval import retrieve_many, build_index
+from src.evidence import window_evidence
+from src.reasoning import classify, decide, confidence_score, gate, BACKENDS, LLM_FAILED_REASON
+from src.batch import results_frame, split_by_book
+from src import jobs, tracing
 from src.report import generate_pdf
-from src.llm_client import ask_llm
-
-def split_by_book(df):
-    books = {}
-    for name in df["book_name"].dropna().unique():
-        books[name] = df[df["book_name"] == name].copy()
-    return books
-
-
-# =========================
-# CLAIM EXTRACTION
-# =========================
-PROMPT = """
-Extract 3–5 factual claims from the text below.
-Return them as simple bullet points.
-
-Text:
-{text}
-"""
-
-def extract_claims(text):
-    raw = ask_llm(PROMPT.format(text=text))
-    lines = raw.split("\n")
-    claims = []
-
-    for ln in lines:
-        ln = ln.strip()
-        ln = re.sub(r"^[-*•\d.]+\s*", "", ln)
-        if len(ln) > 10:
-            claims.append(ln)
-
-    if not claims:
-        claims = ["No explicit claims could be extracted from the backstory."]
-    return claims
-
+from src.claims import extract_claims
 
 # =========================
 # INSTANT ANALYTICS
@@ -56,14 +26,132 @@ def log_usage(action):
     with open(USAGE_LOG, "a") as f:
         f.write(f"{int(time.time())},{action}\n")
 
-log_usage("page_open")
-
 # =========================
 # UI SETUP
 # =========================
 st.set_page_config(page_title="Narrative Consistency Engine", layout="wide")
+
+# every widget interaction reruns the script → count one open per session
+if "page_opened" not in st.session_state:
+    st.session_state.page_opened = True
+    log_usage("page_open")
+
 st.title("📘 Narrative Consistency Reasoning Engine – PRO")
 
+
+# =========================
+# BACKGROUND JOBS
+# =========================
+@st.cache_resource
+def _job_workers():
+    # one set of worker threads per server process, shared by all sessions
+    jobs.start_workers()
+    return True
+
+_job_workers()
+
+def _results_table(out_df):
+    return out_df.rename(columns={
+        "backstory_id": "Backstory ID",
+        "story": "Book",
+        "prediction": "Prediction",
+        "confidence": "Confidence (%)"
+    })[["Backstory ID", "Book", "Prediction", "Confidence (%)"]]
+
+# poll job status without rerunning the whole page
+_poll = st.fragment(run_every=3) if hasattr(st, "fragment") else (lambda f: f)
+
+@_poll
+def job_panel():
+    all_jobs = jobs.list_jobs()
+    if not all_jobs:
+        st.caption("No batch jobs yet.")
+        return
+
+    mine = set(st.session_state.get("my_jobs", []))
+    for job in all_jobs:
+        with st.container(border=True):
+            owner = " · yours" if job["id"] in mine else ""
+            st.write(f"**{job['book']}** — `{job['id']}` · {job['status']}{owner}")
+            st.progress(job["done"] / max(job["total"], 1))
+            elapsed = ""
+            if job["started_at"] and job["heartbeat"]:
+                elapsed = f" · {job['heartbeat'] - job['started_at']:.0f}s"
+            params = json.loads(job["params"])
+            mode = f"{params.get('backend', 'llm')} · {params.get('classify_mode', '')}"
+            if params.get("rerank"):
+                mode += " · rerank"
+            st.caption(f"{job['done']}/{job['total']} backstories · {mode}{elapsed}")
+            if job["error"]:
+                st.error(job["error"])
+
+            out_df = results_frame(job["out_path"])
+            if out_df.empty:
+                continue
+            label = "⬇️ Download Results" if job["status"] == "done" else "⬇️ Download Partial Results"
+            st.download_button(
+                f"{label} for {job['book']}",
+                _results_table(out_df).to_csv(index=False).encode("utf-8"),
+                file_name=f"results_{str(job['book']).replace(' ','_')}.csv",
+                mime="text/csv",
+                key=f"dl_{job['id']}"
+            )
+
+
+# =========================
+# MEMOIZED PIPELINE STAGES
+# (keyed on content hashes; "_" args are not hashed by Streamlit)
+# =========================
+def _sha(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_chunks(story_hash, _story):
+    return chunk_text(_story)
+
+class Uncached(Exception):
+    """Raised inside a cached function so st.cache_data keeps no failed result."""
+    def __init__(self, value):
+        super().__init__()
+        self.value = value
+
+def uncached(fn, *args):
+    try:
+        return fn(*args)
+    except Uncached as e:
+        return e.value
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_claims(backstory_hash, _backstory):
+    # same service (and cache) as the CLIs: the UI sees the same claims
+    claims = extract_claims(_backstory)
+    if not claims:  # LLM error or empty answer -> try again next run
+        raise Uncached(["No explicit claims could be extracted from the backstory."])
+    return claims
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_evidence(story_hash, claims_hash, k, alpha, rerank, _chunks, _claims):
+    # this call's own build info (not a global another session may have written)
+    _, info = build_index(_chunks, chunk_params())
+    hits = retrieve_many(_chunks, _claims, k=k, alpha=alpha, chunk_params=chunk_params(),
+                         with_scores=True, rerank=rerank)
+    evidence, ev_stats = window_evidence(_claims, [ev for ev, _ in hits])
+    info.update(ev_stats)
+    return evidence, [sc for _, sc in hits], info
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_verdicts(story_hash, claims_hash, k, alpha, rerank, backend,
+                    _claims, _evidence, _scores):
+    gated, gate_stats = gate(_claims, _evidence, _scores)
+    labels, reasons = [], []
+    for c, ev, g in zip(_claims, _evidence, gated):
+        l, r = g if g else classify(c, ev, backend=backend)
+        labels.append(l)
+        reasons.append(f"[Evidence {len(ev)}] {r}")
+    if any(r.endswith(LLM_FAILED_REASON) for r in reasons):
+        raise Uncached((labels, reasons, gate_stats))
+    return labels, reasons, gate_stats
+
 mode_tab = st.tabs(["🔍 Single Analysis", "📦 Hackathon Batch Mode"])
 
 # ==========================================================
@@ -86,6 +174,16 @@ with mode_tab[0]:
         k = st.slider("Evidence chunks", 3, 10, 5, key="k_single")
         alpha = st.slider("Hybrid weight", 0.0, 1.0, 0.6, step=0.05, key="a_single")
 
+    backend = st.selectbox(
+        "Reasoning backend", list(BACKENDS), key="backend_single",
+        help="llm: OpenRouter. nli: local CPU NLI cross-encoder, works offline."
+    )
+    rerank = st.checkbox(
+        "Re-rank evidence with a cross-encoder", key="rerank_single",
+        help="Scores the top 30 hybrid hits per claim and keeps the best k — "
+             "use with fewer evidence chunks for smaller prompts."
+    )
+
     run = st.button("🚀 Run Analysis", type="primary", key="run_single")
 
     if run:
@@ -94,20 +192,27 @@ with mode_tab[0]:
         if not story_text or not backstory_text:
             st.warning("Please paste both Story and Backstory.")
         else:
-            with st.spinner("Running full reasoning engine..."):
-                chunks = chunk_text(story_text)
-                claims = extract_claims(backstory_text)
-
-                labels, reasons, rows = [], [], []
-
-                for c in claims:
-                    ev = retrieve(chunks, c, k=k, alpha=alpha)
-                    l, r = classify(c, ev)
-                    r = f"[Evidence {len(ev)}] {r}"
+            with st.spinner("Running full reasoning engine..."), \
+                    tracing.run("single", k=k, alpha=alpha, backend=backend, rerank=rerank) as trace:
+                story_hash, backstory_hash = _sha(story_text), _sha(backstory_text)
+
+                # only stages whose inputs changed are recomputed
+                chunks = cached_chunks(story_hash, story_text)
+                claims = uncached(cached_claims, backstory_hash, backstory_text)
+                # later stages are keyed on the claims themselves, not the backstory:
+                # a placeholder claim list must not be cached as the backstory's
+                claims_hash = _sha(json.dumps(claims, ensure_ascii=False))
+                evidence, scores, index_info = cached_evidence(
+                    story_hash, claims_hash, k, alpha, rerank, chunks, claims
+                )
+                labels, reasons, gate_stats = uncached(
+                    cached_verdicts, story_hash, claims_hash, k, alpha, rerank, backend, claims, evidence, scores
+                )
 
-                    labels.append(l)
-                    reasons.append(r)
-                    rows.append({"Claim": c, "Label": l, "Reason": r})
+                rows = [
+                    {"Claim": c, "Label": l, "Reason": r}
+                    for c, l, r in zip(claims, labels, reasons)
+                ]
 
                 if not labels:
                     labels = ["UNKNOWN"]
@@ -116,45 +221,105 @@ with mode_tab[0]:
                 prediction, rationale = decide(labels, reasons)
                 conf = confidence_score(labels)
 
-            # ---------- OUTPUT ----------
-            st.subheader("✅ Result")
-            st.write("**Prediction:**", "Consistent" if prediction == 1 else "Inconsistent")
-            st.write("**Rationale:**", rationale)
-
-            st.subheader("📊 Confidence")
-            st.progress(conf / 100)
-            st.write(f"{conf}% sure")
-
-            df = pd.DataFrame(rows)
-            st.subheader("📋 Claim-wise Analysis")
-            st.dataframe(df, use_container_width=True)
-
-            st.download_button(
-                "⬇️ Download CSV",
-                data=df.to_csv(index=False),
-                file_name="analysis_results.csv",
-                mime="text/csv"
+                # ---------- PDF (built once per result) ----------
+                os.makedirs("results", exist_ok=True)
+                pdf_file = "results/report.pdf"
+
+                with tracing.stage("report"):
+                    generate_pdf(
+                        pdf_file,
+                        "Consistent" if prediction == 1 else "Inconsistent",
+                        conf,
+                        rationale,
+                        rows
+                    )
+                with open(pdf_file, "rb") as f:
+                    pdf_bytes = f.read()
+
+            # kept across reruns: sliders / downloads don't recompute anything
+            st.session_state.single_result = {
+                "prediction": prediction,
+                "rationale": rationale,
+                "conf": conf,
+                "rows": rows,
+                "index_info": index_info,
+                "gate": gate_stats,
+                "settings": (k, alpha, backend, rerank),
+                "pdf": pdf_bytes,
+                "perf": trace.summary(),
+            }
+
+    res = st.session_state.get("single_result")
+    if res:
+        # ---------- OUTPUT ----------
+        st.subheader("✅ Result")
+        if res["settings"] != (k, alpha, backend, rerank):
+            st.caption(
+                f"Showing results for k={res['settings'][0]}, alpha={res['settings'][1]}, "
+                f"backend={res['settings'][2]}, rerank={res['settings'][3]} "
+                "— press Run Analysis to apply the new settings."
             )
-
-            # ---------- PDF ----------
-            os.makedirs("results", exist_ok=True)
-            pdf_file = "results/report.pdf"
-
-            generate_pdf(
-                pdf_file,
-                "Consistent" if prediction == 1 else "Inconsistent",
-                conf,
-                rationale,
-                rows
+        info = res["index_info"]
+        st.caption(
+            f"Index: embedded {info['embedded']} of {info['chunks']} chunks "
+            f"({info['reused']} reused from earlier runs)"
+        )
+        if info.get("tokens_before"):
+            st.caption(
+                f"Evidence: {info['tokens_before']} → {info['tokens_after']} prompt tokens "
+                "(most relevant sentences only)"
             )
+        g = res["gate"]
+        if g["unknown"] + g["nli"]:
+            st.caption(
+                f"Evidence gate: {g['unknown'] + g['nli']} of {g['checked']} claims "
+                "had no relevant evidence and skipped the LLM"
+            )
+        st.write("**Prediction:**", "Consistent" if res["prediction"] == 1 else "Inconsistent")
+        st.write("**Rationale:**", res["rationale"])
+
+        perf = res.get("perf")
+        if perf:
+            with st.expander(f"⏱️ Performance — {perf['wall_s']:.2f}s"):
+                llm = perf["llm"]
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("LLM requests", llm["llm_requests"])
+                m2.metric("Cache hit rate", "-" if llm["cache_hit_rate"] is None
+                          else f"{llm['cache_hit_rate']:.0%}")
+                m3.metric("LLM p50 / p95", "-" if not llm["http_calls"]
+                          else f"{llm['p50_ms']:.0f} / {llm['p95_ms']:.0f} ms")
+                m4.metric("Retries / 429s", f"{llm['retries']} / {llm['http_429']}")
+                st.caption(f"Tokens: {llm['prompt_tokens']} prompt, "
+                           f"{llm['completion_tokens']} completion. Memoized stages "
+                           "are not re-run and do not appear.")
+                if perf["stages"]:
+                    st.dataframe(
+                        pd.DataFrame.from_dict(perf["stages"], orient="index")
+                          .sort_values("total_s", ascending=False),
+                        use_container_width=True
+                    )
+
+        st.subheader("📊 Confidence")
+        st.progress(res["conf"] / 100)
+        st.write(f"{res['conf']}% sure")
+
+        df = pd.DataFrame(res["rows"])
+        st.subheader("📋 Claim-wise Analysis")
+        st.dataframe(df, use_container_width=True)
+
+        st.download_button(
+            "⬇️ Download CSV",
+            data=df.to_csv(index=False),
+            file_name="analysis_results.csv",
+            mime="text/csv"
+        )
 
-            with open(pdf_file, "rb") as f:
-                st.download_button(
-                    "📄 Download PDF Report",
-                    data=f,
-                    file_name="analysis_report.pdf",
-                    mime="application/pdf"
-                )
+        st.download_button(
+            "📄 Download PDF Report",
+            data=res["pdf"],
+            file_name="analysis_report.pdf",
+            mime="application/pdf"
+        )
 
 # ==========================================================
 # TAB 2 — HACKATHON BATCH MODE
@@ -206,72 +371,55 @@ with mode_tab[1]:
             k2 = st.slider("Evidence chunks", 3, 10, 5)
             alpha2 = st.slider("Hybrid weight", 0.0, 1.0, 0.6, step=0.05)
 
-        run_batch = st.button("🚀 Run for Selected Novel")
+        backend2 = st.selectbox(
+            "Reasoning backend", list(BACKENDS), key="backend_batch",
+            help="llm: OpenRouter. nli: local CPU NLI cross-encoder, works offline."
+        )
+        rerank2 = st.checkbox(
+            "Re-rank evidence with a cross-encoder", key="rerank_batch",
+            help="Scores the top 30 hybrid hits per claim and keeps the best k."
+        )
+
+        batch_claims = st.checkbox(
+            "Batch claims into one LLM call per backstory",
+            value=True,
+            help="Turn off to compare against one LLM call per claim."
+        )
+        joint2 = st.checkbox(
+            "Extract and verify in one LLM call", key="joint_batch",
+            help="Retrieves evidence per backstory sentence; one call lists and labels "
+                 "the claims. LLM backend only."
+        )
+
+        start_batch = st.button("🚀 Queue Selected Novel")
 
-        if run_batch:
+        if start_batch:
 
             if not story_text:
                 st.warning("Please paste the story for this novel.")
                 st.stop()
 
-            with st.spinner(f"Running analysis for: {book_selected}"):
-
-                chunks = chunk_text(story_text)
-                df_book = books[book_selected]
-
-                results = []
-                progress = st.progress(0)
-
-                for i, row in df_book.iterrows():
-                    bid = row["id"]
-                    backstory = str(row["content"])
-
-                    claims = extract_claims(backstory)
-                    labels, reasons = [], []
-
-                    for c in claims:
-                        ev = retrieve(chunks, c, k=k2, alpha=alpha2)
-                        l, r = classify(c, ev)
-                        labels.append(l)
-                        reasons.append(r)
-
-                    if not labels:
-                        labels = ["UNKNOWN"]
-                        reasons = ["No claims evaluated"]
-
-                    pred, rat = decide(labels, reasons)
-                    conf = confidence_score(labels)
-
-                    results.append({
-                        "Backstory ID": bid,
-                        "Book": book_selected,
-                        "Prediction": "consistent" if pred == 1 else "inconsistent",
-                        "Confidence (%)": conf
-                    })
-
-                    total = len(df_book)
-
-                    if total > 0:
-                        value = (i + 1) / total
-                        value = min(max(value, 0.0), 1.0)   # 0–1 ke beech lock
-                        progress.progress(value)
-                    else:
-                        progress.progress(1.0)
-
-
-            # ---- OUTPUT ----
-            out_df = pd.DataFrame(results)
+            df_book = books[book_selected]
+            job_id = jobs.submit(
+                book_selected,
+                story_text,
+                zip(df_book["id"], df_book["content"].astype(str)),
+                k=k2,
+                alpha=alpha2,
+                classify_mode="joint" if joint2 else "batch" if batch_claims else "per-claim",
+                backend=backend2,
+                rerank=rerank2,
+            )
+            log_usage("queue_batch")
 
-            st.success("✅ Analysis complete for selected novel")
-            st.dataframe(out_df, use_container_width=True)
+            my_jobs = st.session_state.setdefault("my_jobs", [])
+            if job_id not in my_jobs:
+                my_jobs.append(job_id)
+            st.success(f"Queued job `{job_id}` — it keeps running if you close this tab.")
 
-            csv_out = out_df.to_csv(index=False).encode("utf-8")
-            st.download_button(
-                f"⬇️ Download Results for {book_selected}",
-                csv_out,
-                file_name=f"results_{book_selected.replace(' ','_')}.csv",
-                mime="text/csv",
-            )
+    # ---- JOB STATUS (queue is shared by all sessions) ----
+    st.markdown("### Batch Jobs")
+    job_panel()
 
 
 # ==========================================================
@@ -283,9 +431,13 @@ st.subheader("🏆 Leaderboard (History)")
 lb_file = "results/leaderboard.csv"
 os.makedirs("results", exist_ok=True)
 
+@st.cache_data(show_spinner=False)
+def load_leaderboard(path, mtime):
+    # mtime in the key → re-read only when the file actually changes
+    return pd.read_csv(path)
+
 if os.path.exists(lb_file) and os.path.getsize(lb_file) > 0:
-    lb = pd.read_csv(lb_file)
+    lb = load_leaderboard(lb_file, os.path.getmtime(lb_file))
     st.dataframe(lb.tail(10), use_container_width=True)
 else:
     st.info("No history yet. Run some analyses to build leaderboard.")
-
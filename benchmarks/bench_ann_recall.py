@@ -0,0 +1,78 @@
+"""
+Recall@k and query latency of the ANN indexes against exact brute force.
+
+    python -m benchmarks.bench_ann_recall --chunks 50000 --queries 1000 --k 5
+
+Uses clustered synthetic 384-d vectors (MiniLM's dimension) by default, or
+real chunk embeddings with --story path/to/novel.txt.
+"""
+import time
+import argparse
+import numpy as np
+
+from src.vector_index import INDEX_KINDS, build_index
+
+
+def _synthetic(n, dim, clusters, rng):
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    return centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def _story_vectors(path, n_queries, rng):
+    from src.ingest import chunk_text
+    from src.retrieval import _get_model
+    with open(path, encoding="utf-8") as f:
+        chunks = chunk_text(f.read())
+    model = _get_model()
+    vecs = np.asarray(model.encode(chunks, show_progress_bar=False), dtype=np.float32)
+    # queries: random sentences-ish slices of the chunks
+    picks = rng.integers(0, len(chunks), n_queries)
+    qs = [" ".join(chunks[i].split()[:20]) for i in picks]
+    return vecs, np.asarray(model.encode(qs, show_progress_bar=False), dtype=np.float32)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=50_000)
+    ap.add_argument("--queries", type=int, default=1_000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--story", default=None)
+    ap.add_argument("--kinds", default=",".join(INDEX_KINDS))
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.story:
+        vecs, queries = _story_vectors(args.story, args.queries, rng)
+    else:
+        data = _synthetic(args.chunks + args.queries, args.dim, max(8, args.chunks // 500), rng)
+        vecs, queries = data[:args.chunks], data[args.chunks:]
+
+    truth = None
+    print(f"chunks={len(vecs)} queries={len(queries)} k={args.k}")
+    print(f"{'index':<6} {'build s':>8} {'query ms':>9} {'recall@k':>9}")
+
+    for kind in ["exact"] + [k for k in args.kinds.split(",") if k != "exact"]:
+        try:
+            t0 = time.perf_counter()
+            index = build_index(kind, vecs)
+            build = time.perf_counter() - t0
+        except ImportError as e:
+            print(f"{kind:<6} skipped ({e})")
+            continue
+
+        t0 = time.perf_counter()
+        _, ids = index.search(queries, args.k)
+        per_query = (time.perf_counter() - t0) / len(queries) * 1000
+
+        if truth is None:
+            truth = ids
+        recall = np.mean([
+            len(set(a) & set(b)) / args.k for a, b in zip(ids.tolist(), truth.tolist())
+        ])
+        print(f"{kind:<6} {build:8.2f} {per_query:9.3f} {recall:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
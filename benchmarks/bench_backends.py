@@ -0,0 +1,96 @@
+"""
+LLM vs local NLI reasoning backend on a labelled CSV.
+
+    python -m benchmarks.bench_backends --story data/stories/story1.txt \
+        --csv train.csv --book "Book Name" --limit 30 [--int8]
+
+Claims and evidence are computed once and shared; each backend then labels
+every claim. Reports claims/sec, claim-level agreement with the LLM labels
+and (if the CSV has a label column) backstory accuracy. --int8 adds the
+ONNX Runtime int8 variant of the NLI model. The LLM runs against a fresh,
+empty cache so its time is real network time.
+"""
+import os
+import time
+import argparse
+import tempfile
+import pandas as pd
+
+from src import llm_client, nli
+from src.llm_cache import LLMCache
+from src.ingest import chunk_text, chunk_params
+from src.claims import extract_claims
+from src.retrieval import retrieve_many
+from src.reasoning import decide
+from src.batch import classify_claims
+
+
+def _label_to_pred(v):
+    return 1 if str(v).strip().lower() in {"1", "consistent", "support"} else 0
+
+
+def run(rows, backend):
+    labels_all, preds = [], []
+    t0 = time.perf_counter()
+    for claims, evidence in rows:
+        labels, reasons = classify_claims(claims, evidence, "batch", backend=backend)
+        labels_all.append(labels)
+        if not labels:
+            labels, reasons = ["UNKNOWN"], ["No claims found"]
+        preds.append(decide(labels, reasons)[0])
+    return labels_all, preds, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--story", required=True)
+    ap.add_argument("--csv", required=True)
+    ap.add_argument("--book", default=None)
+    ap.add_argument("--label-col", default="label")
+    ap.add_argument("--limit", type=int, default=30)
+    ap.add_argument("--int8", action="store_true", help="also run the ONNX int8 NLI model")
+    args = ap.parse_args()
+
+    with open(args.story, encoding="utf-8") as f:
+        chunks = chunk_text(f.read())
+
+    df = pd.read_csv(args.csv)
+    if args.book and "book_name" in df.columns:
+        df = df[df["book_name"] == args.book]
+    df = df.head(args.limit)
+    text_col = "content" if "content" in df.columns else "backstory"
+
+    rows = []
+    for text in df[text_col].astype(str):
+        claims = extract_claims(text)
+        rows.append((claims, retrieve_many(chunks, claims, k=5, chunk_params=chunk_params())))
+    n_claims = sum(len(c) for c, _ in rows)
+
+    res = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        llm_client._cache = LLMCache(os.path.join(tmp, "llm.db"))
+        res["llm"] = run(rows, "llm")
+
+    nli._get_model()  # load outside the timed run, like a warm server
+    res["nli"] = run(rows, "nli")
+
+    if args.int8:
+        nli._model, nli.NLI_ONNX_INT8 = None, True
+        nli._get_model()
+        res["nli-int8"] = run(rows, "nli")
+
+    ref = [l for labels in res["llm"][0] for l in labels]
+    for name, (labels_all, preds, secs) in res.items():
+        flat = [l for labels in labels_all for l in labels]
+        agree = sum(a == b for a, b in zip(flat, ref)) / max(len(ref), 1)
+        line = (f"{name:<9} {secs:7.1f}s  {n_claims / max(secs, 1e-9):7.1f} claims/s"
+                f"  agreement {agree:.3f}")
+        if args.label_col in df.columns:
+            gold = [_label_to_pred(v) for v in df[args.label_col]]
+            acc = sum(p == g for p, g in zip(preds, gold)) / max(len(gold), 1)
+            line += f"  accuracy {acc:.3f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Batched classify_many vs one classify() call per claim on a labelled CSV.
+
+    python -m benchmarks.bench_classify --story data/stories/story1.txt \
+        --csv train.csv --book "Book Name" --limit 30
+
+Reports wall time, LLM calls and (if the CSV has a label column) accuracy of
+both paths plus their agreement. Each path runs against a fresh, empty LLM
+cache so neither benefits from the other's answers.
+"""
+import os
+import time
+import argparse
+import tempfile
+import pandas as pd
+
+from src import llm_client
+from src.llm_cache import LLMCache
+from src.ingest import chunk_text, chunk_params
+from src.claims import extract_claims
+from src.retrieval import retrieve_many
+from src import reasoning
+from src.reasoning import decide
+from src.batch import classify_claims
+
+
+def _patch_counting(calls):
+    real_ask, real_many = reasoning.ask_llm, reasoning.ask_llm_many
+
+    def ask(prompt):
+        calls["n"] += 1
+        return real_ask(prompt)
+
+    def many(prompts):
+        calls["n"] += len(set(prompts))
+        return real_many(prompts)
+
+    reasoning.ask_llm, reasoning.ask_llm_many = ask, many
+    return real_ask, real_many
+
+
+def _label_to_pred(v):
+    return 1 if str(v).strip().lower() in {"1", "consistent", "support"} else 0
+
+
+def run(rows, mode, tmp):
+    # claims / evidence are shared between modes, only classification differs
+    llm_client._cache = LLMCache(os.path.join(tmp, f"{mode}.db"))
+    calls = {"n": 0}
+    real = _patch_counting(calls)
+
+    preds = []
+    t0 = time.perf_counter()
+    try:
+        for claims, evidence in rows:
+            labels, reasons = classify_claims(claims, evidence, mode)
+            if not labels:
+                labels, reasons = ["UNKNOWN"], ["No claims found"]
+            preds.append(decide(labels, reasons)[0])
+    finally:
+        reasoning.ask_llm, reasoning.ask_llm_many = real
+
+    return preds, time.perf_counter() - t0, calls["n"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--story", required=True)
+    ap.add_argument("--csv", required=True)
+    ap.add_argument("--book", default=None)
+    ap.add_argument("--label-col", default="label")
+    ap.add_argument("--limit", type=int, default=30)
+    args = ap.parse_args()
+
+    with open(args.story, encoding="utf-8") as f:
+        chunks = chunk_text(f.read())
+
+    df = pd.read_csv(args.csv)
+    if args.book and "book_name" in df.columns:
+        df = df[df["book_name"] == args.book]
+    df = df.head(args.limit)
+    text_col = "content" if "content" in df.columns else "backstory"
+
+    rows = []
+    for text in df[text_col].astype(str):
+        claims = extract_claims(text)
+        rows.append((claims, retrieve_many(chunks, claims, k=5, chunk_params=chunk_params())))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        res = {m: run(rows, m, tmp) for m in ("per-claim", "batch")}
+
+    for mode, (preds, secs, calls) in res.items():
+        line = f"{mode:<10} {secs:7.1f}s  {calls:4d} LLM calls"
+        if args.label_col in df.columns:
+            gold = [_label_to_pred(v) for v in df[args.label_col]]
+            acc = sum(p == g for p, g in zip(preds, gold)) / max(len(gold), 1)
+            line += f"  accuracy {acc:.3f}"
+        print(line)
+
+    a, b = res["per-claim"][0], res["batch"][0]
+    print(f"agreement  {sum(x == y for x, y in zip(a, b)) / max(len(a), 1):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Offline end-to-end benchmark: synthetic novels and backstories, mock LLM.
+
+    python -m benchmarks.bench_e2e --backstories 10 100 --words 10000 100000 \
+        --paths batch per-claim --latency 0.2 --rate-429 0.05 --out results/bench_e2e.json
+
+For every (backstories, words, path) case a synthetic novel and backstory CSV
+are generated from --seed and the whole batch pipeline (src/batch.py) runs in
+a fresh process with an empty index store and LLM cache, against the local
+mock server (benchmarks/mock_openai_server.py). The mock answers every prompt
+deterministically from its text. Reports backstories/sec, p50/p95 seconds per
+backstory, peak RSS, embedding time and LLM counters per case; the JSON file
+also records the commit, so runs of two commits can be diffed directly.
+
+Paths: batch, per-claim, joint (classify mode), local-claims (batch with the
+local claim extractor and LLM fallback), nli (local backend, no LLM for
+verification), rerank (batch + cross-encoder re-ranking). All other paths
+extract claims with the LLM.
+"""
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.mock_openai_server import mock_openai_server
+
+PATHS = {
+    "batch": {"classify_mode": "batch", "backend": "llm", "rerank": False, "extractor": "llm"},
+    "per-claim": {"classify_mode": "per-claim", "backend": "llm", "rerank": False, "extractor": "llm"},
+    "joint": {"classify_mode": "joint", "backend": "llm", "rerank": False, "extractor": "llm"},
+    "local-claims": {"classify_mode": "batch", "backend": "llm", "rerank": False, "extractor": "auto"},
+    "nli": {"classify_mode": "batch", "backend": "nli", "rerank": False, "extractor": "llm"},
+    "rerank": {"classify_mode": "batch", "backend": "llm", "rerank": True, "extractor": "llm"},
+}
+
+NAMES = ["Arjun", "Meera", "Kabir", "Tara", "Ishaan", "Leela", "Rohan", "Anaya", "Vikram", "Sana"]
+PLACES = ["Devgarh", "the river port", "the old fort", "Calcutta", "the hill school",
+          "the salt market", "the lighthouse", "the monastery"]
+ROLES = ["an army officer", "a schoolteacher", "a smuggler", "a ship's doctor", "a weaver",
+         "a railway clerk", "a priest", "a cartographer"]
+VERBS = ["visited", "left", "defended", "burned", "rebuilt", "mapped", "guarded", "sold"]
+THINGS = ["a silver compass", "his father's letters", "a forged passport", "the ledger",
+          "a wooden flute", "the harbour keys", "a bundle of maps"]
+
+
+# -----------------------------
+# Synthetic data
+# -----------------------------
+def _fact(rng):
+    name = rng.choice(NAMES)
+    return rng.choice([
+        f"{name} grew up in {rng.choice(PLACES)}.",
+        f"{name}'s father was {rng.choice(ROLES)}.",
+        f"{name} {rng.choice(VERBS)} {rng.choice(PLACES)} in {rng.randint(1850, 1950)}.",
+        f"{name} carried {rng.choice(THINGS)} for {rng.randint(2, 30)} years.",
+        f"{name} never trusted {rng.choice(NAMES)} after the fire at {rng.choice(PLACES)}.",
+    ])
+
+
+def make_novel(words, seed):
+    rng = random.Random(seed)
+    paras, n = [], 0
+    while n < words:
+        para = " ".join(_fact(rng) for _ in range(rng.randint(3, 8)))
+        paras.append(para)
+        n += len(para.split())
+    return "\n\n".join(paras)
+
+
+def make_backstories(novel, n, seed):
+    """Half the sentences are copied from the novel, the rest are fresh facts."""
+    rng = random.Random(seed + 1)
+    sentences = re.findall(r"[^.]+\.", novel)
+    rows = []
+    for i in range(n):
+        parts = [rng.choice(sentences).strip() if rng.random() < 0.5 else _fact(rng)
+                 for _ in range(rng.randint(3, 5))]
+        rows.append({"id": i + 1, "backstory": " ".join(parts)})
+    return pd.DataFrame(rows)
+
+
+# -----------------------------
+# Deterministic mock LLM
+# -----------------------------
+def _label(claim):
+    h = int(hashlib.sha256(claim.encode("utf-8")).hexdigest(), 16) % 10
+    return "SUPPORT" if h < 5 else "CONTRADICT" if h < 7 else "UNKNOWN"
+
+
+def responder(prompt):
+    """Well-formed answers for every prompt the pipeline sends, from the prompt alone."""
+    if "sentence by sentence" in prompt:
+        sentences = re.findall(r"^S\d+: (.*) \(passages: [^)]*\)$", prompt, re.MULTILINE)
+        return json.dumps({"results": [
+            {"claim": s, "label": _label(s), "reason": "mock"} for s in sentences
+        ]})
+    if '"claims"' in prompt:
+        text = prompt.split("Text:", 1)[-1].split("Return ONLY", 1)[0]
+        claims = [s.strip() for s in re.findall(r"[^.]+\.", text)][:5]
+        return json.dumps({"claims": claims})
+    if '"results"' in prompt:
+        claims = re.findall(r"^Claim \d+: (.*)$", prompt, re.MULTILINE)
+        return json.dumps({"results": [
+            {"id": i, "label": _label(c), "reason": "mock"} for i, c in enumerate(claims, 1)
+        ]})
+    if '"label"' in prompt:
+        claim = prompt.split("Claim:", 1)[-1].split("Evidence:", 1)[0].strip()
+        return json.dumps({"label": _label(claim), "reason": "mock"})
+    return "mock response"
+
+
+# -----------------------------
+# One case, in a fresh process
+# -----------------------------
+def _peak_rss_mb():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1e6 if platform.system() == "Darwin" else rss / 1024  # bytes vs KiB
+
+
+def _run_case(case, workdir, url):
+    params = dict(PATHS[case["path"]])
+    # configure before any src import: every case starts cold
+    os.environ.update({
+        "CLAIM_EXTRACTOR": params.pop("extractor"),
+        "OPENROUTER_API_URL": url,
+        "OPENROUTER_API_KEY": "mock",
+        "LLM_RATE_PER_MIN": "60000",
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.db"),
+        "INDEX_DIR": os.path.join(workdir, "index"),
+        "EMBED_SOCKET": os.path.join(workdir, "no-embed-server.sock"),
+        "TRACE_LOG": os.path.join(workdir, "traces.jsonl"),
+    })
+    from src import tracing
+    from src.retrieval import embed
+    from src.batch import run_batch
+    from src.ingest import chunk_text, chunk_params
+
+    with open(case["novel"], encoding="utf-8") as f:
+        story = f.read()
+    df = pd.read_csv(case["csv"])
+
+    t0 = time.perf_counter()
+    embed(["warm-up"])  # model load is reported apart from embedding time
+    model_load = time.perf_counter() - t0
+
+    per_row = []
+    with tracing.run("bench_e2e", **{k: case[k] for k in ("path", "backstories", "words")}) as t:
+        t0 = time.perf_counter()
+        chunks = chunk_text(story)
+        last = time.perf_counter()
+        for _ in run_batch(chunks, zip(df["id"], df["backstory"]),
+                           os.path.join(workdir, "results.jsonl"), "synthetic",
+                           chunk_params=chunk_params(), **params):
+            now = time.perf_counter()
+            per_row.append(now - last)
+            last = now
+        wall = time.perf_counter() - t0
+    trace = t.summary()
+
+    stages = trace["stages"]
+    llm = trace["llm"]
+    return {
+        **{k: case[k] for k in ("path", "backstories", "words")},
+        "chunks": len(chunks),
+        "wall_s": round(wall, 3),
+        "backstories_per_s": round(len(per_row) / wall, 3) if wall else None,
+        "p50_s": round(float(np.percentile(per_row, 50)), 4) if per_row else None,
+        "p95_s": round(float(np.percentile(per_row, 95)), 4) if per_row else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "model_load_s": round(model_load, 3),
+        "embed_s": stages.get("embed", {}).get("total_s", 0.0),
+        "index_build_s": stages.get("index_build", {}).get("total_s", 0.0),
+        "llm": {k: llm[k] for k in ("llm_requests", "cache_hits", "http_calls", "retries",
+                                    "http_429", "errors", "p50_ms", "p95_ms")},
+        "stages": stages,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--backstories", type=int, nargs="+", default=[10],
+                    help="backstories per case (1 to 1000)")
+    ap.add_argument("--words", type=int, nargs="+", default=[10_000],
+                    help="novel length in words (10k to 500k)")
+    ap.add_argument("--paths", nargs="+", choices=list(PATHS), default=["batch", "per-claim"])
+    ap.add_argument("--latency", type=float, default=0.2, help="mock LLM seconds per request")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="share of requests answered 429")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="results/bench_e2e.json")
+    args = ap.parse_args()
+
+    for n in args.backstories:
+        if not 1 <= n <= 1000:
+            ap.error("--backstories must be between 1 and 1000")
+    for w in args.words:
+        if not 10_000 <= w <= 500_000:
+            ap.error("--words must be between 10000 and 500000")
+
+    cases = []
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="bench_e2e_") as tmp, \
+            mock_openai_server(latency=args.latency, rate_429=args.rate_429,
+                               responder=responder, seed=args.seed) as url:
+        print(f"{'path':<12} {'rows':>5} {'words':>7} {'rows/s':>7} {'p50 s':>7} {'p95 s':>7} "
+              f"{'RSS MB':>7} {'embed s':>7} {'LLM':>5} {'429':>4}")
+        for words in args.words:
+            novel = make_novel(words, args.seed)
+            novel_path = os.path.join(tmp, f"novel_{words}.txt")
+            with open(novel_path, "w", encoding="utf-8") as f:
+                f.write(novel)
+
+            for n in args.backstories:
+                csv_path = os.path.join(tmp, f"backstories_{words}_{n}.csv")
+                make_backstories(novel, n, args.seed).to_csv(csv_path, index=False)
+
+                for path in args.paths:
+                    workdir = os.path.join(tmp, f"{path}_{words}_{n}")
+                    os.makedirs(workdir)
+                    case = {"path": path, "backstories": n, "words": words,
+                            "novel": novel_path, "csv": csv_path}
+                    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                        r = pool.submit(_run_case, case, workdir, url).result()
+                    cases.append(r)
+                    print(f"{path:<12} {n:5d} {words:7d} {r['backstories_per_s']:7.2f} "
+                          f"{r['p50_s']:7.3f} {r['p95_s']:7.3f} {r['peak_rss_mb']:7.0f} "
+                          f"{r['embed_s']:7.2f} {r['llm']['http_calls']:5d} "
+                          f"{r['llm']['http_429']:4d}")
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": _commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "settings": {k: v for k, v in vars(args).items() if k != "out"},
+            "machine": {"python": platform.python_version(), "cpus": os.cpu_count()},
+            "cases": cases,
+        }, f, indent=2)
+    print(f"✅ {args.out} written ({len(cases)} cases)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Two-phase extract + classify vs the single-call "joint" mode on a labelled CSV.
+
+    python -m benchmarks.bench_joint --story data/stories/story1.txt \
+        --csv train.csv --book "Book Name" --limit 30
+
+Both modes run the whole per-backstory pipeline (src/batch.py
+process_backstory, no claim reuse) against a fresh, empty LLM cache.
+Reports p50/p95 seconds per backstory, LLM requests and (if the CSV has a
+label column) accuracy of both modes plus their agreement.
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from src import llm_client, tracing
+from src.llm_cache import LLMCache
+from src.ingest import chunk_text, chunk_params
+from src.batch import process_backstory
+
+MODES = ("batch", "joint")
+
+
+def _label_to_pred(v):
+    return 1 if str(v).strip().lower() in {"1", "consistent", "support"} else 0
+
+
+def run(chunks, texts, mode, tmp):
+    llm_client._cache = LLMCache(os.path.join(tmp, f"{mode}.db"))
+    preds, secs = [], []
+    with tracing.run(f"bench_joint_{mode}", log=False) as t:
+        for text in texts:
+            t0 = time.perf_counter()
+            rec = process_backstory(chunks, text, chunk_params=chunk_params(), classify_mode=mode)
+            secs.append(time.perf_counter() - t0)
+            preds.append(1 if rec["prediction"] == "consistent" else 0)
+    return preds, secs, t.summary()["llm"]["llm_requests"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--story", required=True)
+    ap.add_argument("--csv", required=True)
+    ap.add_argument("--book", default=None)
+    ap.add_argument("--label-col", default="label")
+    ap.add_argument("--limit", type=int, default=30)
+    args = ap.parse_args()
+
+    with open(args.story, encoding="utf-8") as f:
+        chunks = chunk_text(f.read())
+
+    df = pd.read_csv(args.csv)
+    if args.book and "book_name" in df.columns:
+        df = df[df["book_name"] == args.book]
+    df = df.head(args.limit)
+    text_col = "content" if "content" in df.columns else "backstory"
+    texts = df[text_col].astype(str).tolist()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        res = {m: run(chunks, texts, m, tmp) for m in MODES}
+
+    for mode, (preds, secs, calls) in res.items():
+        line = (f"{mode:<6} {sum(secs):7.1f}s  p50 {np.percentile(secs, 50):5.2f}s  "
+                f"p95 {np.percentile(secs, 95):5.2f}s  {calls:4d} LLM requests")
+        if args.label_col in df.columns:
+            gold = [_label_to_pred(v) for v in df[args.label_col]]
+            acc = sum(p == g for p, g in zip(preds, gold)) / max(len(gold), 1)
+            line += f"  accuracy {acc:.3f}"
+        print(line)
+
+    a, b = res["batch"][0], res["joint"][0]
+    print(f"agreement  {sum(x == y for x, y in zip(a, b)) / max(len(a), 1):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Sequential ask_llm vs concurrent ask_llm_many against the local mock server.
+
+    python -m benchmarks.bench_llm_throughput --n 40 --latency 0.3 --rate-429 0.05
+"""
+import time
+import uuid
+import argparse
+
+from benchmarks.mock_openai_server import mock_openai_server
+from src import llm_client
+
+
+def _prompts(n):
+    run = uuid.uuid4().hex[:8]  # unique per run so the cache never hits
+    return [f"[{run}] claim {i}: return JSON" for i in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=40)
+    ap.add_argument("--latency", type=float, default=0.3)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--workers", type=int, default=llm_client.MAX_CONCURRENCY)
+    args = ap.parse_args()
+
+    llm_client.OPENROUTER_API_KEY = llm_client.OPENROUTER_API_KEY or "mock"
+    # the mock server is local -> don't let the real-world rate limit dominate
+    llm_client._bucket = llm_client.TokenBucket(rate_per_min=60_000, capacity=args.workers)
+
+    with mock_openai_server(latency=args.latency, rate_429=args.rate_429) as url:
+        llm_client.API_URL = url
+
+        t0 = time.perf_counter()
+        for p in _prompts(args.n):
+            llm_client.ask_llm(p)
+        seq = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        llm_client.ask_llm_many(_prompts(args.n), max_workers=args.workers)
+        conc = time.perf_counter() - t0
+
+    print(f"prompts={args.n} latency={args.latency}s workers={args.workers}")
+    print(f"sequential : {seq:.2f}s  ({args.n / seq:.1f} req/s)")
+    print(f"concurrent : {conc:.2f}s  ({args.n / conc:.1f} req/s)  x{seq / conc:.1f}")
+
+
+if __name__ == "__main__":
+    main()
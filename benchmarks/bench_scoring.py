@@ -0,0 +1,90 @@
+"""
+Hybrid scoring kernel vs the previous per-call implementation.
+
+    python -m benchmarks.bench_scoring --sizes 1000 10000 100000 --queries 16
+
+Synthetic 384-d unit embeddings and hashed TF-IDF rows (~40 terms per chunk).
+"previous" re-normalises the chunk embeddings, builds new arrays for every
+min-max / blend step and fully argsorts each row; "kernel" is
+retrieval._hybrid_top_k. Reports ms per batched call and peak bytes
+allocated per call (tracemalloc).
+"""
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from scipy import sparse
+
+from src.retrieval import _hybrid_top_k
+from src.tfidf import N_FEATURES, _l2_rows
+
+
+def _previous(q_emb, emb, q_tfidf, X, k, alpha):
+    def cosine(a, b):
+        a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+        b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+        return a @ b.T
+
+    def norm_rows(x):
+        lo = x.min(axis=1, keepdims=True)
+        span = x.max(axis=1, keepdims=True) - lo
+        flat = span < 1e-9
+        return np.where(flat, x, (x - lo) / np.where(flat, 1.0, span))
+
+    sim = alpha * norm_rows(cosine(q_emb, emb)) \
+        + (1 - alpha) * norm_rows((q_tfidf @ X.T).toarray())
+    return np.argsort(sim, axis=1)[:, ::-1][:, :k]
+
+
+def _sparse_rows(n, terms, rng):
+    indptr = np.arange(0, (n + 1) * terms, terms)
+    indices = rng.integers(0, N_FEATURES, n * terms).astype(np.int32)
+    data = rng.integers(1, 4, n * terms).astype(np.float32)
+    m = sparse.csr_matrix((data, indices, indptr), shape=(n, N_FEATURES))
+    m.sum_duplicates()
+    return _l2_rows(m)
+
+
+def _measure(fn, repeat):
+    fn()  # warm-up: buffers, BLAS threads
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    ms = (time.perf_counter() - t0) / repeat * 1000
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return ms, peak
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    ap.add_argument("--queries", type=int, default=16)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    q = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    q_tfidf = _sparse_rows(args.queries, 8, rng)
+
+    print(f"{'chunks':>8}  {'previous ms':>11}  {'kernel ms':>9}  {'speedup':>7}  "
+          f"{'previous MB':>11}  {'kernel MB':>9}")
+    for n in args.sizes:
+        emb = rng.standard_normal((n, args.dim)).astype(np.float32)
+        emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+        X = _sparse_rows(n, 40, rng)
+
+        old_ms, old_peak = _measure(lambda: _previous(q, emb, q_tfidf, X, args.k, 0.65), args.repeat)
+        new_ms, new_peak = _measure(lambda: _hybrid_top_k(q, emb, q_tfidf, X, args.k, 0.65), args.repeat)
+        print(f"{n:8d}  {old_ms:11.2f}  {new_ms:9.2f}  {old_ms / max(new_ms, 1e-9):6.1f}x  "
+              f"{old_peak / 1e6:11.1f}  {new_peak / 1e6:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
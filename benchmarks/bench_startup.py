@@ -0,0 +1,72 @@
+"""
+Cold-start time of each entry point, and time to the first embedding with and
+without the warm embedding server.
+
+    python -m benchmarks.bench_startup --runs 3
+    python -m src.embed_server &        # then run again to see the warm path
+
+Every measurement is a fresh interpreter started in a scratch directory, so
+nothing (usage log, caches) is written into the repo.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = {
+    "app.py (import)": "import app",
+    "src.pipeline": "import src.pipeline",
+    "src.run_hackathon": "import src.run_hackathon",
+    "src.run_books": "import src.run_books",
+    "src.retrieval": "import src.retrieval",
+}
+
+FIRST_EMBEDDING = "from src.retrieval import _encode; _encode(['warm up'])"
+
+
+def _time(code, cwd, env, runs):
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        r = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        elapsed = time.perf_counter() - t0
+        if r.returncode != 0:
+            return None, r.stderr.strip().splitlines()[-1] if r.stderr else "failed"
+        best = min(best, elapsed)
+    return best, None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    socket_path = os.path.abspath(os.getenv("EMBED_SOCKET", os.path.join(ROOT, ".cache", "embed.sock")))
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, code in ENTRY_POINTS.items():
+            rows.append((name, *_time(code, tmp, env, args.runs)))
+
+        cold_env = dict(env, EMBED_SOCKET="")
+        rows.append(("first embedding (in-process)", *_time(FIRST_EMBEDDING, tmp, cold_env, args.runs)))
+
+        if os.path.exists(socket_path):
+            warm_env = dict(env, EMBED_SOCKET=socket_path)
+            rows.append(("first embedding (warm server)", *_time(FIRST_EMBEDDING, tmp, warm_env, args.runs)))
+        else:
+            rows.append(("first embedding (warm server)", None, "server not running"))
+
+    print(f"best of {args.runs} runs")
+    for name, secs, err in rows:
+        print(f"{name:<32} " + (f"{secs:6.2f}s" if secs is not None else f"  -    ({err})"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Calibrate EVIDENCE_GATE_THRESHOLD against the LLM's own verdicts.
+
+    python -m benchmarks.calibrate_gate --story data/stories/story1.txt \
+        --csv train.csv --book "Book Name" --limit 30
+
+Every claim is retrieved with scores and classified by the LLM with the gate
+off. For each candidate threshold the table shows how many claims the gate
+would skip and how many of those the LLM did NOT call UNKNOWN (the verdicts
+the gate would lose). Pick the largest threshold with an acceptable loss.
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+from src.ingest import chunk_text, chunk_params
+from src.claims import extract_claims
+from src.retrieval import retrieve_many
+from src.reasoning import classify_many, GATE_THRESHOLD
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--story", required=True)
+    ap.add_argument("--csv", required=True)
+    ap.add_argument("--book", default=None)
+    ap.add_argument("--limit", type=int, default=30)
+    ap.add_argument("--max-loss", type=float, default=0.05,
+                    help="tolerated share of gated claims the LLM would have decided")
+    args = ap.parse_args()
+
+    with open(args.story, encoding="utf-8") as f:
+        chunks = chunk_text(f.read())
+
+    df = pd.read_csv(args.csv)
+    if args.book and "book_name" in df.columns:
+        df = df[df["book_name"] == args.book]
+    df = df.head(args.limit)
+    text_col = "content" if "content" in df.columns else "backstory"
+
+    best, labels = [], []
+    for text in df[text_col].astype(str):
+        claims = extract_claims(text)
+        hits = retrieve_many(chunks, claims, k=5, chunk_params=chunk_params(), with_scores=True)
+        ls, _ = classify_many(claims, {c: ev for c, (ev, _) in zip(claims, hits)})
+        best += [max(sc) if sc else 0.0 for _, sc in hits]
+        labels += ls
+
+    best = np.asarray(best)
+    decided = np.asarray([l != "UNKNOWN" for l in labels])
+    print(f"{len(best)} claims, {int(decided.sum())} decided by the LLM")
+    print(f"best score: p10 {np.percentile(best, 10):.3f}  p50 {np.percentile(best, 50):.3f}"
+          f"  p90 {np.percentile(best, 90):.3f}")
+
+    print(f"{'threshold':>9}  {'gated':>6}  {'lost':>5}  {'loss':>6}")
+    pick = 0.0
+    for t in np.round(np.arange(0.05, 0.55, 0.05), 2):
+        gated = best < t
+        lost = int((gated & decided).sum())
+        loss = lost / max(int(gated.sum()), 1)
+        mark = " *" if abs(t - GATE_THRESHOLD) < 1e-9 else ""
+        print(f"{t:9.2f}  {int(gated.sum()):6d}  {lost:5d}  {loss:6.1%}{mark}")
+        if loss <= args.max_loss:
+            pick = t
+
+    print(f"suggested EVIDENCE_GATE_THRESHOLD={pick:.2f} (current {GATE_THRESHOLD:.2f}, marked *)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Local OpenAI-compatible chat completions server for offline benchmarking.
+
+    with mock_openai_server(latency=0.3, rate_429=0.1) as url:
+        llm_client.API_URL = url
+        ...
+
+or standalone:
+
+    python -m benchmarks.mock_openai_server --port 8765 --latency 0.3
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _default_responder(prompt):
+    if "JSON" in prompt:
+        return json.dumps({"label": "UNKNOWN", "reason": "mock response"})
+    return "mock response"
+
+
+def _make_handler(latency, rate_429, retry_after, responder, stats, rng):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, body, headers=None):
+            raw = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+
+            with stats["lock"]:
+                stats["requests"] += 1
+
+            with stats["lock"]:
+                limited = bool(rate_429) and rng.random() < rate_429
+            if limited:
+                with stats["lock"]:
+                    stats["rate_limited"] += 1
+                self._send(429, {"error": {"message": "rate limited"}},
+                           {"Retry-After": str(retry_after)})
+                return
+
+            time.sleep(latency)
+
+            messages = payload.get("messages", [])
+            prompt = messages[-1]["content"] if messages else ""
+            text = responder(prompt)
+
+            self._send(200, {
+                "id": "mock",
+                "object": "chat.completion",
+                "model": payload.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": len(prompt.split()),
+                    "completion_tokens": len(text.split()),
+                },
+            })
+
+    return Handler
+
+
+@contextmanager
+def mock_openai_server(port=0, latency=0.2, rate_429=0.0, retry_after=0.5, responder=None,
+                       seed=None):
+    """Run the mock server in a background thread; yields its completions URL.
+    seed fixes the sequence of injected 429s."""
+    stats = {"requests": 0, "rate_limited": 0, "lock": threading.Lock()}
+    handler = _make_handler(latency, rate_429, retry_after, responder or _default_responder, stats,
+                            random.Random(seed))
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.stats = stats
+
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    args = ap.parse_args()
+
+    with mock_openai_server(args.port, args.latency, args.rate_429) as url:
+        print(f"🚀 Mock OpenAI server on {url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
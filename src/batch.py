@@ -0,0 +1,280 @@
+import os
+import json
+import hashlib
+import functools
+import pandas as pd
+
+from src.claims import extract_claims
+from src.llm_client import LLMError
+from src.chunking import sentence_spans
+from src.retrieval import retrieve_many
+from src import reasoning
+from src.reasoning import (classify, classify_many, decide, confidence_score, gate,
+                           extract_and_verify, get_backend, LLMBackend)
+from src.dedup import ClaimResolver
+from src import evidence as evidence_mod
+from src.evidence import window_evidence
+
+# -----------------------------
+# Streaming, resumable batch engine
+#
+# Each finished backstory is appended as one JSON line to the results file,
+# so a crash / rerun / LLM outage only loses the row in flight. Rows whose
+# backstory_id is already in the file are skipped on restart. A row the LLM
+# failed on (extraction error or an unjudged claim) is never written, so the
+# next run retries it.
+# -----------------------------
+
+# claim extraction for the batch engine: an LLM error raises instead of
+# looking like a backstory without claims
+extract_strict = functools.partial(extract_claims, strict=True)
+
+def split_by_book(df):
+    books = {}
+    for name in df["book_name"].dropna().unique():
+        books[name] = df[df["book_name"] == name].copy()
+    return books
+
+
+def run_settings(k, alpha, classify_mode, backend, rerank, extractor, dedup=True):
+    """
+    Every setting that can change a verdict, for checkpoint_path: the
+    arguments plus the evidence gate and the evidence / classify token
+    budgets read from the environment.
+    """
+    return (k, alpha, classify_mode, backend, rerank, extractor, dedup,
+            reasoning.GATE_MODE, reasoning.GATE_THRESHOLD,
+            evidence_mod.EVIDENCE_TOKEN_BUDGET, reasoning.BATCH_TOKEN_BUDGET)
+
+
+def checkpoint_path(out_dir, name, *settings):
+    """Results file for one (book, story text, settings) combination."""
+    h = hashlib.sha256(json.dumps([str(s) for s in settings]).encode("utf-8")).hexdigest()[:12]
+    safe = "".join(ch if ch.isalnum() else "_" for ch in str(name))
+    return os.path.join(out_dir, f"{safe}_{h}.jsonl")
+
+
+def load_results(path):
+    """backstory_id -> record for every complete line in a results file."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+                done[str(rec["backstory_id"])] = rec
+            except (ValueError, KeyError, TypeError):
+                continue  # torn last line from a crash
+    return done
+
+
+def _end_torn_line(path):
+    # a crash mid-write leaves a partial line; don't glue the next record to it
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def results_frame(path):
+    return pd.DataFrame(list(load_results(path).values()))
+
+
+def classify_claims(claims, evidence, mode="batch", scores=None, gate_stats=None, backend=None):
+    """
+    mode: "batch" (several claims per LLM call) or "per-claim".
+    backend: reasoning backend name ("llm" / "nli", default from env).
+
+    With retrieval scores, claims failing reasoning.gate are decided without
+    the LLM; gate_stats (a dict) accumulates how many.
+    """
+    gated, stats = gate(claims, evidence, scores)
+    if gate_stats is not None:
+        for key, n in stats.items():
+            gate_stats[key] = gate_stats.get(key, 0) + n
+
+    todo = [i for i, g in enumerate(gated) if g is None]
+    todo_claims = [claims[i] for i in todo]
+    todo_evidence = [evidence[i] for i in todo]
+
+    if mode == "batch":
+        labels, reasons = classify_many(todo_claims, dict(zip(todo_claims, todo_evidence)),
+                                        backend=backend)
+    else:
+        labels, reasons = [], []
+        for c, ev in zip(todo_claims, todo_evidence):
+            l, r = classify(c, ev, backend=backend)
+            labels.append(l)
+            reasons.append(r)
+
+    for i, l, r in zip(todo, labels, reasons):
+        gated[i] = (l, r)
+    return [g[0] for g in gated], [g[1] for g in gated]
+
+
+def _joint_verdicts(chunks, text, k, alpha, chunk_params, rerank, evidence_stats):
+    # evidence is retrieved per backstory sentence, before any claim exists
+    sentences = [text[s:e] for s, e, _ in sentence_spans(text)]
+    hits = retrieve_many(chunks, sentences, k=k, alpha=alpha, chunk_params=chunk_params,
+                         with_scores=True, rerank=rerank)
+    evidence, ev_stats = window_evidence(sentences, [ev for ev, _ in hits])
+    if evidence_stats is not None:
+        for key, n in ev_stats.items():
+            evidence_stats[key] = evidence_stats.get(key, 0) + n
+    if reasoning.GATE_MODE != "off":
+        # sentences without relevant evidence go in with none, not noise
+        evidence = [ev if sc and max(sc) >= reasoning.GATE_THRESHOLD else []
+                    for ev, (_, sc) in zip(evidence, hits)]
+    return extract_and_verify(sentences, evidence)
+
+
+def process_backstory(chunks, text, k=5, alpha=0.65, chunk_params=None,
+                      classify_mode="batch", extract_fn=extract_strict,
+                      resolver=None, source=None, gate_stats=None, backend=None, rerank=None,
+                      evidence_stats=None):
+    """
+    extract → retrieve → classify → decide for one backstory.
+
+    With a ClaimResolver, claims already resolved for an earlier backstory of
+    the same story reuse that evidence and verdict; only new claims are
+    retrieved and sent to the LLM. Reuses are listed under "reused".
+    Claims without relevant evidence are gated (see classify_claims); the
+    rest get windowed evidence (src/evidence.py), whose prompt token counts
+    before / after accumulate in evidence_stats.
+
+    classify_mode="joint" retrieves evidence for every backstory sentence and
+    lets one LLM call both list and label the claims (no claim reuse); an
+    unusable answer, or a non-LLM backend, falls back to the batch flow.
+
+    Raises LLMError when the LLM failed on this backstory (extract_fn raised
+    it, or a claim came back as reasoning.LLM_FAILED_REASON); failed verdicts
+    are not offered to the resolver.
+    """
+    if classify_mode == "joint":
+        joint = None
+        if isinstance(get_backend(backend), LLMBackend):
+            joint = _joint_verdicts(chunks, text, k, alpha, chunk_params, rerank, evidence_stats)
+        if joint is not None:
+            claims, labels, reasons = joint
+            pred, rat = decide(labels, reasons)
+            return {
+                "prediction": "consistent" if pred == 1 else "inconsistent",
+                "confidence": confidence_score(labels),
+                "rationale": rat,
+                "claims": len(claims),
+                "reused": [],
+            }
+        classify_mode = "batch"
+
+    claims = extract_fn(text)
+
+    matches, vecs = resolver.match(claims) if resolver else ([None] * len(claims), None)
+    new = [i for i, m in enumerate(matches) if m is None]
+
+    new_claims = [claims[i] for i in new]
+    hits = retrieve_many(chunks, new_claims, k=k, alpha=alpha, chunk_params=chunk_params,
+                         with_scores=True, rerank=rerank)
+    new_evidence, ev_stats = window_evidence(new_claims, [ev for ev, _ in hits])
+    if evidence_stats is not None:
+        for key, n in ev_stats.items():
+            evidence_stats[key] = evidence_stats.get(key, 0) + n
+    new_labels, new_reasons = classify_claims(new_claims, new_evidence, classify_mode,
+                                              scores=[sc for _, sc in hits],
+                                              gate_stats=gate_stats, backend=backend)
+
+    labels, reasons, reused = [None] * len(claims), [None] * len(claims), []
+    for j, i in enumerate(new):
+        labels[i], reasons[i] = new_labels[j], new_reasons[j]
+        if resolver and reasons[i] != reasoning.LLM_FAILED_REASON:
+            resolver.add(claims[i], vecs[i], source, new_evidence[j], labels[i], reasons[i])
+    for i, m in enumerate(matches):
+        if resolver:
+            resolver.record(m[1] if m else None)
+        if m is None:
+            continue
+        entry, kind, sim = m
+        labels[i], reasons[i] = entry["label"], entry["reason"]
+        reused.append({
+            "claim": claims[i],
+            "from_backstory": entry["source"],
+            "from_claim": entry["claim"],
+            "match": kind,
+            "similarity": round(sim, 4),
+        })
+
+    failed = reasons.count(reasoning.LLM_FAILED_REASON)
+    if failed:
+        raise LLMError(f"LLM could not judge {failed} of {len(claims)} claims")
+
+    # safety
+    if not labels:
+        labels = ["UNKNOWN"]
+        reasons = ["No claims found"]
+
+    pred, rat = decide(labels, reasons)
+    return {
+        "prediction": "consistent" if pred == 1 else "inconsistent",
+        "confidence": confidence_score(labels),
+        "rationale": rat,
+        "claims": len(claims),
+        "reused": reused,
+    }
+
+
+def run_batch(chunks, rows, out_path, story_name="", k=5, alpha=0.65, chunk_params=None,
+              classify_mode="batch", extract_fn=extract_strict, dedup=True, backend=None,
+              rerank=None):
+    """
+    rows: list of (backstory_id, backstory_text)
+
+    Generator: yields {"done", "total", "record", "skipped", "failed", "dedup",
+    "gate", "evidence"} after every row so callers can show progress and
+    partial results. dedup, gate and evidence hold this run's claim reuse,
+    LLM-skip and prompt token counters. A failed row (LLM error) is not
+    written; its record has "error" instead of a prediction.
+    """
+    resolver = ClaimResolver() if dedup else None
+    dedup_stats = resolver.stats if resolver else {}
+    gate_stats = {"checked": 0, "unknown": 0, "nli": 0}
+    evidence_stats = {"tokens_before": 0, "tokens_after": 0}
+    rows = list(rows)
+    total = len(rows)
+    done = load_results(out_path)
+
+    d = os.path.dirname(out_path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+
+    _end_torn_line(out_path)
+
+    with open(out_path, "a", encoding="utf-8") as f:
+        for i, (bid, text) in enumerate(rows, 1):
+            if str(bid) in done:
+                yield {"done": i, "total": total, "record": done[str(bid)], "skipped": True,
+                       "failed": False, "dedup": dedup_stats, "gate": gate_stats, "evidence": evidence_stats}
+                continue
+
+            bid = bid.item() if hasattr(bid, "item") else bid
+            rec = {"story": story_name, "backstory_id": bid}
+            try:
+                rec.update(process_backstory(
+                    chunks, str(text), k, alpha, chunk_params, classify_mode, extract_fn,
+                    resolver=resolver, source=bid, gate_stats=gate_stats, backend=backend,
+                    rerank=rerank, evidence_stats=evidence_stats,
+                ))
+            except LLMError as e:
+                rec["error"] = str(e)
+                yield {"done": i, "total": total, "record": rec, "skipped": False,
+                       "failed": True, "dedup": dedup_stats, "gate": gate_stats,
+                       "evidence": evidence_stats}
+                continue
+
+            f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+            yield {"done": i, "total": total, "record": rec, "skipped": False,
+                   "failed": False, "dedup": dedup_stats, "gate": gate_stats, "evidence": evidence_stats}
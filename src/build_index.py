@@ -0,0 +1,78 @@
+"""
+Precompute story index bundles for a whole novel library.
+
+    python -m src.build_index --novels data/novels [--dtype float16] [--ann hnsw]
+
+Every <novels>/*.txt is chunked with the shared chunker and indexed into the
+store (src/index_store.py), with chunk texts and story offsets. Later runs on
+the same text open the bundle by memory-mapping it instead of embedding.
+Point INDEX_DIR at the same directory on another machine to ship the library.
+--dtype and --max-mb are saved with the store (store.json), so the app and
+CLIs opening it use the same dtype and never evict the library to fit the
+default budget; INDEX_EMB_DTYPE / INDEX_CACHE_MAX_MB still override them.
+"""
+import os
+import time
+import argparse
+
+from src import index_store, retrieval
+from src.ingest import chunk_spans, chunk_params
+from src.vector_index import INDEX_KINDS
+
+
+def _size_mb(key):
+    d = os.path.join(index_store.INDEX_DIR, key)
+    return sum(os.path.getsize(os.path.join(d, n)) for n in os.listdir(d)) / 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--novels", required=True, help="directory of <book_name>.txt files")
+    ap.add_argument("--dtype", choices=["float32", "float16"], default=index_store.EMB_DTYPE,
+                    help="embedding storage dtype (saved with the store)")
+    ap.add_argument("--ann", choices=[k for k in INDEX_KINDS if k != "exact"], default=None,
+                    help="also build an ANN index for stories with many chunks")
+    ap.add_argument("--max-mb", type=float, default=None,
+                    help="store budget (INDEX_CACHE_MAX_MB), saved with the store; "
+                         "must fit the whole library")
+    args = ap.parse_args()
+
+    index_store.EMB_DTYPE = args.dtype
+    if args.max_mb is not None:
+        index_store.MAX_DISK_MB = args.max_mb
+    index_store.save_store_config()
+
+    names = sorted(n for n in os.listdir(args.novels) if n.lower().endswith(".txt"))
+    if not names:
+        print(f"❌ No .txt files in {args.novels}")
+        return
+
+    t0 = time.perf_counter()
+    keys = []
+    for name in names:
+        with open(os.path.join(args.novels, name), "r", encoding="utf-8") as f:
+            story = f.read()
+        spans = chunk_spans(story)
+        chunks = [story[s:e] for s, e in spans]
+
+        t = time.perf_counter()
+        key, b = retrieval.build_index(chunks, chunk_params(), spans)
+        if args.ann and len(chunks) >= retrieval.ANN_MIN_CHUNKS:
+            index_store.load_vector_index(key, args.ann, index_store.load_embeddings(key))
+        keys.append(key)
+
+        how = "cached" if b["cached"] else f"embedded {b['embedded']}, reused {b['reused']}"
+        print(f"✅ {name}: {len(chunks)} chunks ({how}) → {key} "
+              f"{_size_mb(key):.1f} MB {time.perf_counter() - t:.1f}s")
+
+    missing = [k for k in keys if index_store.load_manifest(k) is None]
+    if missing:
+        print(f"⚠️ {len(missing)} bundles were evicted — raise --max-mb / INDEX_CACHE_MAX_MB")
+
+    st = index_store.stats()
+    print(f"⏱️ {len(names)} novels in {time.perf_counter() - t0:.1f}s; store "
+          f"{index_store.INDEX_DIR}: {st['entries']} bundles, {st['bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
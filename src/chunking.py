@@ -0,0 +1,124 @@
+import re
+
+from src.retrieval import EMB_MODEL_NAME
+
+# -----------------------------
+# Shared story chunker
+#
+# Chunks follow sentence and paragraph boundaries and are sized in tokens of
+# the embedding model: all-MiniLM-L6-v2 truncates input at 256 tokens, so
+# anything longer would never be embedded. Chunks are (start, end) character
+# offsets into the story, so later stages can slice evidence without copies.
+# -----------------------------
+MAX_TOKENS = 250      # 256 minus [CLS]/[SEP] and a little slack
+OVERLAP_TOKENS = 40   # trailing sentences carried into the next chunk
+
+_PARAGRAPH = re.compile(r"\S(?:.*?\S)?(?=\s*\n\s*\n|\s*\Z)", re.S)
+_SENTENCE = re.compile(r"[^.!?]+(?:[.!?]+[\"'”’)\]]*|\Z)|[.!?]+")
+_WORD = re.compile(r"\S+")
+
+_tokenizer = None
+_tokenizer_name = None
+
+def _get_tokenizer():
+    """(tokenizer or None, name). Falls back to a word-count estimate offline."""
+    global _tokenizer, _tokenizer_name
+    if _tokenizer_name is None:
+        try:
+            from transformers import AutoTokenizer
+            _tokenizer = AutoTokenizer.from_pretrained(f"sentence-transformers/{EMB_MODEL_NAME}")
+            _tokenizer_name = EMB_MODEL_NAME
+        except Exception:
+            _tokenizer, _tokenizer_name = None, "approx"
+    return _tokenizer, _tokenizer_name
+
+def count_tokens(texts):
+    tok, _ = _get_tokenizer()
+    if tok is None:
+        return [int(len(t.split()) * 1.3) + 1 for t in texts]
+    ids = tok(list(texts), add_special_tokens=False)["input_ids"]
+    return [len(x) for x in ids]
+
+def chunk_params(max_tokens=MAX_TOKENS, overlap_tokens=OVERLAP_TOKENS):
+    """Identifies the chunker in the story index key (see src/index_store.py)."""
+    return {
+        "chunker": "sentences",
+        "max_tokens": max_tokens,
+        "overlap_tokens": overlap_tokens,
+        "tokenizer": _get_tokenizer()[1],
+    }
+
+
+# ---------- SEGMENTATION ----------
+def _strip_span(text, s, e):
+    while s < e and text[s].isspace():
+        s += 1
+    while e > s and text[e - 1].isspace():
+        e -= 1
+    return s, e
+
+def sentence_spans(text):
+    """[(start, end, starts_paragraph)] for every sentence in text."""
+    spans = []
+    for para in _PARAGRAPH.finditer(text):
+        first = True
+        for m in _SENTENCE.finditer(text, para.start(), para.end()):
+            s, e = _strip_span(text, m.start(), m.end())
+            if s < e:
+                spans.append((s, e, first))
+                first = False
+    return spans
+
+def _split_long(text, s, e, n_tokens, max_tokens):
+    # a single sentence over budget -> cut it on word boundaries
+    words = [(m.start() + s, m.end() + s) for m in _WORD.finditer(text[s:e])]
+    per = max(1, int(len(words) * max_tokens / max(n_tokens, 1)))
+    return [(words[i][0], words[min(i + per, len(words)) - 1][1])
+            for i in range(0, len(words), per)]
+
+
+# ---------- CHUNKING ----------
+def chunk_spans(text, max_tokens=MAX_TOKENS, overlap_tokens=OVERLAP_TOKENS):
+    """Character (start, end) offsets of every chunk."""
+    sents = sentence_spans(text)
+    if not sents:
+        return []
+
+    counts = count_tokens([text[s:e] for s, e, _ in sents])
+
+    pieces = []  # (start, end, tokens, starts_paragraph)
+    for (s, e, para), n in zip(sents, counts):
+        if n <= max_tokens:
+            pieces.append((s, e, n, para))
+            continue
+        parts = _split_long(text, s, e, n, max_tokens)
+        for j, (ps, pe) in enumerate(parts):
+            pieces.append((ps, pe, min(n, max_tokens), para and j == 0))
+
+    spans = []
+    cur, cur_tokens = [], 0
+    for piece in pieces:
+        s, e, n, para = piece
+        # prefer to end a reasonably full chunk at a paragraph break
+        para_break = para and cur_tokens >= max_tokens // 2
+        if cur and (cur_tokens + n > max_tokens or para_break):
+            spans.append((cur[0][0], cur[-1][1]))
+
+            carry, carry_tokens = [], 0
+            if not para_break:
+                for p in reversed(cur):
+                    if carry_tokens + p[2] > overlap_tokens or carry_tokens + p[2] + n > max_tokens:
+                        break
+                    carry.insert(0, p)
+                    carry_tokens += p[2]
+            cur, cur_tokens = carry, carry_tokens
+
+        cur.append(piece)
+        cur_tokens += n
+
+    if cur:
+        spans.append((cur[0][0], cur[-1][1]))
+    return spans
+
+def chunk_text(text, max_tokens=MAX_TOKENS, overlap_tokens=OVERLAP_TOKENS):
+    return [text[s:e] for s, e in chunk_spans(text, max_tokens, overlap_tokens)]
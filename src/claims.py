@@ -1,10 +1,46 @@
-from src.llm_client import ask_llm
-import json, re
+from src import llm_client
+from src.llm_client import ask_llm_many
+from src.llm_cache import cache_key
+from src.local_claims import segment
+from src.tracing import traced
+import json, os, re
+import pandas as pd
 
+# -----------------------------
+# Claim extraction service
+#
+# The one place backstories become claims (app, CLIs, batch engine):
+#     extract_claims(text)               -> [claim, ...]
+#     extract_claims_many(texts)         -> one list per text, LLM calls concurrent
+#     extract_column(df, "backstory")    -> Series of claim lists
+# Parsed LLM results are cached in the LLM cache under PROMPT_VERSION, so
+# every caller gets the same claims for the same text, and a prompt change
+# (bump PROMPT_VERSION) never serves stale ones.
+# -----------------------------
+
+# who splits a backstory into claims:
+#   "llm"   -> one LLM call (PROMPT below)
+#   "local" -> src/local_claims.py only, no network
+#   "auto"  -> local first; the LLM only when the local result looks unreliable
+# "auto" is opt-in: the local splitter misses claims in appositive-heavy text
+CLAIM_EXTRACTOR = os.getenv("CLAIM_EXTRACTOR", "llm")
+CLAIM_EXTRACTORS = ("llm", "local", "auto")
+
+# "auto" falls back to the LLM when the local extractor finds fewer than
+# LOCAL_MIN_CLAIMS claims, drops more than LOCAL_MAX_DROPPED clauses per
+# sentence (questions, hedges) or leaves a clause over LOCAL_MAX_WORDS unsplit
+LOCAL_MIN_CLAIMS = int(os.getenv("CLAIM_LOCAL_MIN_CLAIMS", "2"))
+LOCAL_MAX_DROPPED = float(os.getenv("CLAIM_LOCAL_MAX_DROPPED", "0.5"))
+LOCAL_MAX_WORDS = int(os.getenv("CLAIM_LOCAL_MAX_WORDS", "40"))
+
+MIN_CLAIM_CHARS = 10
+
+PROMPT_VERSION = "claims-v2"
 PROMPT = """
 You are an AI that MUST return ONLY valid JSON.
 
-Extract factual claims from the text below.
+Extract the factual claims made in the text below: one short, self-contained
+statement per fact, with names instead of pronouns.
 
 Text:
 {text}
@@ -19,16 +55,100 @@ Return ONLY in this exact JSON format (no extra words):
 }}
 """
 
-def extract_claims(text):
-    raw = ask_llm(PROMPT.format(text=text))
+def local_is_enough(claims, sentences, dropped):
+    if len(claims) < LOCAL_MIN_CLAIMS:
+        return False
+    if dropped / max(sentences, 1) > LOCAL_MAX_DROPPED:
+        return False
+    return max(len(c.split()) for c in claims) <= LOCAL_MAX_WORDS
+
+def _local(text, mode):
+    """Local claims, or None when the LLM has to extract them."""
+    if mode == "llm":
+        return None
+    claims, sentences, dropped = segment(text)
+    if mode == "local" or local_is_enough(claims, sentences, dropped):
+        return claims
+    return None
 
-    match = re.search(r"\{.*\}", raw, re.DOTALL)
-    if not match:
-        return []
 
-    try:
-        data = json.loads(match.group(0))
-        return data.get("claims", [])
-    except Exception:
+# ---------- PARSING ----------
+def _clean(items):
+    out = []
+    for item in items:
+        if isinstance(item, dict):
+            item = item.get("claim") or item.get("text") or ""
+        item = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", str(item)).strip()
+        if len(item) > MIN_CLAIM_CHARS:
+            out.append(item)
+    return list(dict.fromkeys(out))
+
+def parse_claims(raw):
+    """
+    Claims from an LLM answer: {"claims": [...]}, a bare JSON list (also inside
+    a code fence or prose), or bullet / numbered lines as a last resort.
+    """
+    if not raw or llm_client.is_error(raw):
         return []
 
+    for pattern in (r"\{.*\}", r"\[.*\]"):
+        m = re.search(pattern, raw, re.DOTALL)
+        if not m:
+            continue
+        try:
+            data = json.loads(m.group(0))
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            data = data.get("claims")
+        if isinstance(data, list):
+            return _clean(data)
+
+    lines = [ln for ln in raw.splitlines() if re.match(r"^\s*(?:[-*•]|\d+[.)])\s+", ln)]
+    return _clean(lines)
+
+
+# ---------- SERVICE ----------
+def _result_key(text):
+    return cache_key(llm_client.MODEL, PROMPT_VERSION, 0, text)
+
+@traced("extract_claims")
+def extract_claims_many(texts, extractor=None, strict=False):
+    """
+    Claims for every text; duplicates are extracted once, LLM calls run
+    concurrently. A failed LLM call yields [] or, with strict, LLMError.
+    """
+    mode = extractor or CLAIM_EXTRACTOR
+    if mode not in CLAIM_EXTRACTORS:
+        raise ValueError(f"Unknown claim extractor: {mode}")
+
+    texts = [str(t) for t in texts]
+    found, todo = {}, []
+    for text in dict.fromkeys(texts):
+        local = _local(text, mode)
+        if local is not None:
+            found[text] = local
+            continue
+        cached = llm_client.get_result(_result_key(text))
+        if cached is not None:
+            found[text] = json.loads(cached)
+        else:
+            todo.append(text)
+
+    raws = ask_llm_many([PROMPT.format(text=t) for t in todo])
+    for text, raw in zip(todo, raws):
+        if strict and llm_client.is_error(raw):
+            raise llm_client.LLMError(f"claim extraction failed: {raw}")
+        found[text] = parse_claims(raw)
+        if found[text]:  # errors and empty answers are retried next time
+            llm_client.set_result(_result_key(text), json.dumps(found[text], ensure_ascii=False))
+
+    return [found[t] for t in texts]
+
+def extract_claims(text, extractor=None, strict=False):
+    return extract_claims_many([text], extractor, strict)[0]
+
+def extract_column(df, column, extractor=None):
+    """Claim lists for a DataFrame column of backstories, aligned with df.index."""
+    return pd.Series(extract_claims_many(df[column].astype(str).tolist(), extractor),
+                     index=df.index, dtype=object)
@@ -0,0 +1,88 @@
+import os
+import re
+import numpy as np
+
+from src.retrieval import embed
+
+# -----------------------------
+# Claim canonicalisation + near-duplicate reuse
+#
+# Backstories for the same character repeat claims almost word for word.
+# A ClaimResolver lives for one story / batch run: every resolved claim is
+# remembered with its evidence and verdict, and a later claim that is an exact
+# (canonical) or near duplicate (cosine >= threshold) reuses them instead of
+# another retrieve + LLM call. Claims that differ in negation or in numbers
+# are never merged, whatever their similarity.
+# -----------------------------
+DEDUP_THRESHOLD = float(os.getenv("CLAIM_DEDUP_THRESHOLD", "0.92"))
+
+_NEGATIONS = {"no", "not", "never", "none", "nobody", "nothing", "neither", "nor", "without"}
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def canonicalize(claim):
+    words = _WORD.findall(claim.lower().replace("’", "'"))
+    return " ".join(words)
+
+
+def _signature(canon):
+    words = canon.split()
+    negated = any(w in _NEGATIONS or w.endswith("n't") for w in words)
+    numbers = frozenset(w for w in words if any(ch.isdigit() for ch in w))
+    return negated, numbers
+
+
+class ClaimResolver:
+    def __init__(self, threshold=DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self._by_canon = {}
+        self._vecs = []
+        self._entries = []  # {"claim", "source", "evidence", "label", "reason", "sig"}
+        self.stats = {"claims": 0, "exact_reuse": 0, "semantic_reuse": 0}
+
+    def match(self, claims):
+        """
+        For each claim: (entry, kind, similarity) of a reusable earlier claim,
+        or None. Also returns the claim embeddings for add().
+        """
+        canons = [canonicalize(c) for c in claims]
+        vecs = embed(claims) if claims else np.zeros((0, 0), dtype=np.float32)
+
+        sims = None
+        if self._vecs and len(vecs):
+            sims = vecs @ np.stack(self._vecs).T
+
+        out = []
+        for i, canon in enumerate(canons):
+            if canon in self._by_canon:
+                out.append((self._entries[self._by_canon[canon]], "exact", 1.0))
+                continue
+            hit = None
+            if sims is not None:
+                sig = _signature(canon)
+                for j in np.argsort(-sims[i]):
+                    if sims[i, j] < self.threshold:
+                        break
+                    if self._entries[j]["sig"] == sig:
+                        hit = (self._entries[j], "semantic", float(sims[i, j]))
+                        break
+            out.append(hit)
+        return out, vecs
+
+    def add(self, claim, vec, source, evidence, label, reason):
+        canon = canonicalize(claim)
+        self._by_canon.setdefault(canon, len(self._entries))
+        self._vecs.append(vec)
+        self._entries.append({
+            "claim": claim,
+            "source": source,
+            "evidence": evidence,
+            "label": label,
+            "reason": reason,
+            "sig": _signature(canon),
+        })
+
+    def record(self, kind):
+        self.stats["claims"] += 1
+        if kind:
+            self.stats[f"{kind}_reuse"] += 1
@@ -0,0 +1,134 @@
+"""
+Long-lived embedding worker so every entry point shares one warm model.
+
+    python -m src.embed_server            # listens on .cache/embed.sock
+
+retrieval.py uses the socket automatically when it exists (override the path
+with EMBED_SOCKET, set it to "" to disable) and falls back to loading the
+model in-process if the server is unreachable.
+
+Wire format (both directions): 4-byte big-endian length + payload.
+  request : JSON {"model": str, "texts": [str, ...]}
+  response: JSON header {"shape": [n, d]} or {"error": str},
+            followed (on success) by one frame of raw float32 bytes
+"""
+import os
+import json
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+
+SOCKET_PATH = os.getenv("EMBED_SOCKET", os.path.join(".cache", "embed.sock"))
+
+
+# -----------------------------
+# framing
+# -----------------------------
+def _send(sock, payload):
+    sock.sendall(struct.pack(">I", len(payload)) + payload)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        part = sock.recv(n - len(buf))
+        if not part:
+            raise ConnectionError("embedding server closed the connection")
+        buf += part
+    return bytes(buf)
+
+
+def _recv(sock):
+    (n,) = struct.unpack(">I", _recv_exact(sock, 4))
+    return _recv_exact(sock, n)
+
+
+# -----------------------------
+# client
+# -----------------------------
+def available(path=SOCKET_PATH):
+    return bool(path) and os.path.exists(path)
+
+
+def encode_remote(texts, model_name, path=SOCKET_PATH, timeout=120):
+    import numpy as np
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(path)
+        _send(s, json.dumps({"model": model_name, "texts": list(texts)}).encode("utf-8"))
+        header = json.loads(_recv(s))
+        if "error" in header:
+            raise RuntimeError(header["error"])
+        data = _recv(s)
+    return np.frombuffer(data, dtype=np.float32).reshape(header["shape"])
+
+
+# -----------------------------
+# server
+# -----------------------------
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            req = json.loads(_recv(self.request))
+        except (ConnectionError, ValueError):
+            return
+
+        srv = self.server
+        if req.get("model") != srv.model_name:
+            _send(self.request, json.dumps(
+                {"error": f"server has {srv.model_name}, asked for {req.get('model')}"}
+            ).encode("utf-8"))
+            return
+
+        import numpy as np
+        with srv.lock:  # one forward pass at a time on the shared model
+            vecs = srv.model.encode(req.get("texts", []), show_progress_bar=False)
+        vecs = np.ascontiguousarray(vecs, dtype=np.float32)
+
+        _send(self.request, json.dumps({"shape": list(vecs.shape)}).encode("utf-8"))
+        _send(self.request, vecs.tobytes())
+
+
+class EmbedServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, model_name):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket from a previous run
+        super().__init__(path, _Handler)
+
+
+def main():
+    from src.retrieval import EMB_MODEL_NAME
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--socket", default=SOCKET_PATH or os.path.join(".cache", "embed.sock"))
+    ap.add_argument("--model", default=EMB_MODEL_NAME)
+    args = ap.parse_args()
+
+    d = os.path.dirname(args.socket)
+    if d:
+        os.makedirs(d, exist_ok=True)
+
+    server = EmbedServer(args.socket, args.model)
+    print(f"🚀 Embedding server ({args.model}) on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
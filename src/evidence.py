@@ -0,0 +1,97 @@
+import os
+import threading
+import numpy as np
+
+from src.chunking import sentence_spans, count_tokens
+from src.llm_client import EVIDENCE_PER_CLAIM
+from src.retrieval import embed
+from src.tracing import traced
+
+# -----------------------------
+# Evidence windowing
+#
+# Retrieval returns whole chunks, but a claim is usually settled by a couple
+# of sentences. Between retrieval and reasoning, every chunk is cut into
+# sentences, the sentences most similar to the claim are kept until the
+# token budget is spent, and kept sentences that are adjacent in the chunk
+# are merged back into one passage. Chunks keep their retrieval order.
+# -----------------------------
+EVIDENCE_TOKEN_BUDGET = int(os.getenv("EVIDENCE_TOKEN_BUDGET", "300"))  # 0 = whole chunks
+EVIDENCE_MAX_CHUNKS = EVIDENCE_PER_CLAIM  # what classify() would have sent
+GAP = " … "
+
+_SENT_EMB = {}
+_SENT_EMB_MAX = 50_000
+_sent_lock = threading.Lock()  # shared with the job worker threads
+
+def _embed_sentences(texts):
+    # the same chunks come back for many claims -> embed each sentence once
+    with _sent_lock:
+        known = {t: _SENT_EMB[t] for t in texts if t in _SENT_EMB}
+    missing = list(dict.fromkeys(t for t in texts if t not in known))
+    if missing:
+        known.update(zip(missing, embed(missing)))  # encode outside the lock
+        with _sent_lock:
+            if len(_SENT_EMB) + len(missing) > _SENT_EMB_MAX:
+                _SENT_EMB.clear()
+            _SENT_EMB.update((t, known[t]) for t in missing)
+    return np.stack([known[t] for t in texts])
+
+def _sentences(chunk):
+    return [(s, e) for s, e, _ in sentence_spans(chunk)]
+
+@traced("evidence_window")
+def window_evidence(claims, evidence, token_budget=None):
+    """
+    evidence: list of chunk lists aligned with claims.
+    Returns (windowed evidence, stats) with prompt tokens before and after.
+    """
+    budget = EVIDENCE_TOKEN_BUDGET if token_budget is None else token_budget
+    evidence = [list(ev[:EVIDENCE_MAX_CHUNKS]) for ev in evidence]
+    before = sum(sum(count_tokens(ev)) for ev in evidence if ev)
+    if budget <= 0 or not claims:
+        return evidence, {"tokens_before": before, "tokens_after": before}
+
+    chunk_sents = {ch: _sentences(ch) for ev in evidence for ch in ev}
+    texts = list(dict.fromkeys(ch[s:e] for ch, spans in chunk_sents.items() for s, e in spans))
+    if not texts:
+        return evidence, {"tokens_before": before, "tokens_after": before}
+
+    sent_vecs = dict(zip(texts, _embed_sentences(texts)))
+    sent_tokens = dict(zip(texts, count_tokens(texts)))
+    claim_vecs = embed(claims)
+
+    out, after = [], 0
+    for claim_vec, ev in zip(claim_vecs, evidence):
+        # (similarity, chunk position, sentence position) over all chunks
+        cands = []
+        for ci, ch in enumerate(ev):
+            for si, (s, e) in enumerate(chunk_sents[ch]):
+                cands.append((float(sent_vecs[ch[s:e]] @ claim_vec), ci, si))
+        cands.sort(key=lambda c: -c[0])
+
+        picked, used = {}, 0
+        for _, ci, si in cands:
+            s, e = chunk_sents[ev[ci]][si]
+            n = sent_tokens[ev[ci][s:e]]
+            if used + n > budget and used:
+                continue
+            picked.setdefault(ci, []).append(si)
+            used += n
+            if used >= budget:
+                break
+
+        windows = []
+        for ci in sorted(picked):
+            ch, spans = ev[ci], chunk_sents[ev[ci]]
+            runs = []
+            for si in sorted(picked[ci]):
+                if runs and si == runs[-1][1] + 1:
+                    runs[-1][1] = si
+                else:
+                    runs.append([si, si])
+            windows.append(GAP.join(ch[spans[a][0]:spans[b][1]] for a, b in runs))
+
+        out.append(windows)
+        after += used
+    return out, {"tokens_before": before, "tokens_after": after}
@@ -1,13 +1,50 @@
+import os
+import json
+import argparse
 import pandas as pd
 
 REQUIRED_COLUMNS = ["Backstory ID", "Prediction"]
 
-def main():
-    inp = "hackathon_results.csv"
-    out = "final_submission.csv"
+def _read_jsonl(paths):
+    # tolerate a torn last line from an interrupted batch run
+    rows = []
+    for p in paths:
+        with open(p, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue
+    return pd.DataFrame(rows)
+
+def _read_checkpoints(paths):
+    # one checkpoint per (book, settings): the same id in two files means runs
+    # with different settings were left side by side -> refuse to mix them
+    frames, owner = [], {}
+    for p in paths:
+        df = _read_jsonl([p])
+        for bid in df.get("backstory_id", pd.Series(dtype=object)).astype(str):
+            if owner.setdefault(bid, p) != p:
+                raise ValueError(
+                    f"Backstory ID {bid} is in {os.path.basename(owner[bid])} and "
+                    f"{os.path.basename(p)} (runs with different settings); "
+                    "pass one checkpoint file or remove the stale one"
+                )
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
 
-    df = pd.read_csv(inp)
+def read_results(inp):
+    """CSV, a results .jsonl, or a directory of batch checkpoint .jsonl files."""
+    if os.path.isdir(inp):
+        paths = sorted(
+            os.path.join(inp, n) for n in os.listdir(inp) if n.endswith(".jsonl")
+        )
+        return _read_checkpoints(paths)
+    if inp.endswith(".jsonl"):
+        return _read_jsonl([inp])
+    return pd.read_csv(inp)
 
+def to_submission(df):
     # Rename if needed
     if "backstory_id" in df.columns:
         df = df.rename(columns={"backstory_id": "Backstory ID"})
@@ -15,19 +52,34 @@ def main():
         df = df.rename(columns={"prediction": "Prediction"})
 
     # Keep only required columns
-    df = df[REQUIRED_COLUMNS]
+    df = df[REQUIRED_COLUMNS].drop_duplicates("Backstory ID", keep="last").copy()
 
     # Normalize values
-    df["Prediction"] = df["Prediction"].str.lower().map({
+    df["Prediction"] = df["Prediction"].astype(str).str.lower().map({
         "consistent": 1,
         "inconsistent": 0,
         "1": 1,
         "0": 0
     }).fillna(0).astype(int)
+    return df
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input", default="hackathon_results.csv",
+                    help="results CSV, .jsonl, or checkpoint directory (partial runs ok)")
+    ap.add_argument("--output", default="final_submission.csv")
+    args = ap.parse_args()
+
+    inp = args.input
+    out = args.output
 
+    try:
+        df = to_submission(read_results(inp))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
     df.to_csv(out, index=False)
     print(f"✅ Final submission file created: {out}")
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+
+from src.vector_index import load_or_build
+
+# -----------------------------
+# Content-addressed story index store
+#
+# .cache/index/<key>/          one bundle per story index (format FORMAT_VERSION)
+#     manifest.json            format, embedding model, dim, dtype, chunker
+#                              params, per-chunk content hashes
+#     emb.npy                  chunk embeddings, float32 or float16
+#     counts_{data,indices,indptr}.npy   raw hashed term counts (CSR arrays)
+#     tfidf_{data,indices,indptr}.npy    weighted, L2-normalised TF-IDF (CSR)
+#     idf.npy                  IDF over the hashed feature space (src/tfidf.py)
+#     texts.bin                chunk texts, UTF-8, back to back
+#     text_offsets.npy         byte offsets into texts.bin (n_chunks + 1)
+#     spans.npy                (start, end) chunk offsets in the story, if known
+#     vec_<kind>.bin           optional ANN index (see src/vector_index.py)
+# .cache/index/store.json      store settings (disk budget, dtype) saved by
+#                              src/build_index.py for every later process
+#
+# Everything is a plain .npy / byte file: no pickle, and every array is
+# memory-mapped on load, so opening an index copies nothing. The manifest is
+# written last and marks the bundle complete; bundles of another format
+# version are ignored and rebuilt.
+#
+# key = hash(chunk list, chunking params, embedding model name, dtype), so
+# several stories live side by side, an edited story never reuses a stale
+# index and float16 / float32 bundles are never served for each other.
+# Per-chunk hashes let a new index borrow rows for unchanged chunks from
+# recent entries (reusable_rows), so an edit only re-embeds what changed.
+# Least recently used entries are evicted once the store exceeds the budget.
+# -----------------------------
+INDEX_DIR = os.getenv("INDEX_DIR", os.path.join(".cache", "index"))
+STORE_CONFIG = os.path.join(INDEX_DIR, "store.json")
+
+
+def _store_config():
+    try:
+        with open(STORE_CONFIG, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# env > store.json (a precomputed library's own settings) > default
+_config = _store_config()
+MAX_DISK_MB = float(os.getenv("INDEX_CACHE_MAX_MB") or _config.get("max_mb", 512))
+# or "float16": half the disk / page cache
+EMB_DTYPE = os.getenv("INDEX_EMB_DTYPE") or _config.get("dtype", "float32")
+FORMAT_VERSION = 3  # 3: embeddings stored L2-normalised
+REUSE_SCAN = 4  # most recent entries searched for reusable chunk rows
+
+
+def chunk_hash(chunk):
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:20]
+
+
+def index_key(chunks, model_name, chunk_params=None, dtype=None):
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    h.update((dtype or EMB_DTYPE).encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps(chunk_params or {}, sort_keys=True).encode("utf-8"))
+    h.update(b"\0")
+    for c in chunks:
+        h.update(hashlib.sha256(c.encode("utf-8")).digest())
+    return h.hexdigest()[:32]
+
+
+def save_store_config():
+    """Persist the disk budget and dtype so every process using the store inherits them."""
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    raw = json.dumps({"max_mb": MAX_DISK_MB, "dtype": EMB_DTYPE}).encode("utf-8")
+    _atomic_write(STORE_CONFIG, lambda f: f.write(raw))
+
+
+def _entry_dir(key):
+    return os.path.join(INDEX_DIR, key)
+
+
+def entry_path(key, name):
+    os.makedirs(_entry_dir(key), exist_ok=True)
+    return os.path.join(_entry_dir(key), name)
+
+
+def _touch(key):
+    try:
+        os.utime(_entry_dir(key), None)
+    except OSError:
+        pass
+
+
+def _atomic_write(path, write_fn):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        write_fn(f)
+    os.replace(tmp, path)
+
+
+def _save_array(key, name, arr):
+    arr = np.ascontiguousarray(arr)
+    _atomic_write(entry_path(key, f"{name}.npy"), lambda f: np.save(f, arr))
+
+
+def _load_array(key, name):
+    p = os.path.join(_entry_dir(key), f"{name}.npy")
+    if not os.path.exists(p):
+        return None
+    return np.load(p, mmap_mode="r")
+
+
+# -----------------------------
+# Manifest (written last = bundle complete)
+# -----------------------------
+def load_manifest(key):
+    p = os.path.join(_entry_dir(key), "manifest.json")
+    if not os.path.exists(p):
+        return None
+    with open(p, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return manifest if manifest.get("format") == FORMAT_VERSION else None
+
+
+def save_manifest(key, manifest):
+    raw = json.dumps(dict(manifest, format=FORMAT_VERSION)).encode("utf-8")
+    _atomic_write(entry_path(key, "manifest.json"), lambda f: f.write(raw))
+
+
+# -----------------------------
+# Embeddings (.npy, mmap)
+# -----------------------------
+def load_embeddings(key):
+    emb = _load_array(key, "emb")
+    if emb is not None:
+        _touch(key)
+    return emb
+
+
+def save_embeddings(key, vecs, dtype=None):
+    _save_array(key, "emb", np.asarray(vecs, dtype=dtype or EMB_DTYPE))
+    _evict(keep=key)
+
+
+# -----------------------------
+# Sparse matrices as raw CSR arrays (term counts, TF-IDF)
+# -----------------------------
+def _save_csr(key, prefix, m):
+    m = m.tocsr()
+    m.sort_indices()
+    # one index dtype for both arrays, else scipy upcasts (= copies) on use
+    idx = np.int32 if m.nnz < np.iinfo(np.int32).max else np.int64
+    _save_array(key, f"{prefix}_data", m.data.astype(np.float32, copy=False))
+    _save_array(key, f"{prefix}_indices", m.indices.astype(idx, copy=False))
+    _save_array(key, f"{prefix}_indptr", m.indptr.astype(idx, copy=False))
+
+
+def _load_csr(key, prefix, n_features):
+    from scipy import sparse
+    parts = [_load_array(key, f"{prefix}_{p}") for p in ("data", "indices", "indptr")]
+    if any(a is None for a in parts):
+        return None
+    data, indices, indptr = parts
+    _touch(key)
+    m = sparse.csr_matrix((len(indptr) - 1, n_features), dtype=np.float32)
+    # assign the mmapped arrays directly: the constructor would copy them
+    m.data, m.indices, m.indptr = data, indices, indptr
+    return m
+
+
+def load_counts(key, n_features):
+    return _load_csr(key, "counts", n_features)
+
+
+def save_counts(key, counts):
+    _save_csr(key, "counts", counts)
+    _evict(keep=key)
+
+
+def load_tfidf(key, n_features):
+    """(idf, L2-normalised TF-IDF matrix) or None."""
+    idf = _load_array(key, "idf")
+    X = _load_csr(key, "tfidf", n_features)
+    if idf is None or X is None:
+        return None
+    return idf, X
+
+
+def save_tfidf(key, idf, X):
+    _save_array(key, "idf", np.asarray(idf, dtype=np.float32))
+    _save_csr(key, "tfidf", X)
+    _evict(keep=key)
+
+
+# -----------------------------
+# Chunk texts + story offsets
+# -----------------------------
+def save_chunks(key, chunks, spans=None):
+    encoded = [c.encode("utf-8") for c in chunks]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    _atomic_write(entry_path(key, "texts.bin"), lambda f: f.write(b"".join(encoded)))
+    _save_array(key, "text_offsets", offsets)
+    if spans is not None:
+        _save_array(key, "spans", np.asarray(spans, dtype=np.int64).reshape(-1, 2))
+
+
+def load_chunks(key):
+    """(list of chunk texts, (n, 2) story offsets or None) or None."""
+    p = os.path.join(_entry_dir(key), "texts.bin")
+    offsets = _load_array(key, "text_offsets")
+    if offsets is None or not os.path.exists(p):
+        return None
+    with open(p, "rb") as f:
+        blob = f.read()
+    chunks = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+    return chunks, _load_array(key, "spans")
+
+
+# -----------------------------
+# Incremental reuse
+# -----------------------------
+def reusable_rows(model_name, hashes, exclude=None, dtype=None):
+    """
+    Find rows for the given chunk hashes in the most recently used entries
+    built with the same model and dtype. Returns {chunk_hash: (entry_key, row)}.
+    """
+    dtype = dtype or EMB_DTYPE
+    if not os.path.isdir(INDEX_DIR):
+        return {}
+
+    wanted = set(hashes)
+    entries = sorted(
+        (k for k in os.listdir(INDEX_DIR) if k != exclude and os.path.isdir(_entry_dir(k))),
+        key=lambda k: os.path.getmtime(_entry_dir(k)),
+        reverse=True,
+    )[:REUSE_SCAN]
+
+    found = {}
+    for key in entries:
+        manifest = load_manifest(key)
+        if not manifest or manifest.get("model") != model_name or manifest.get("dtype") != dtype:
+            continue
+        for row, h in enumerate(manifest.get("hashes", [])):
+            if h in wanted and h not in found:
+                found[h] = (key, row)
+        if len(found) == len(wanted):
+            break
+    return found
+
+
+# -----------------------------
+# ANN vector index
+# -----------------------------
+def load_vector_index(key, kind, vecs):
+    index = load_or_build(kind, vecs, entry_path(key, f"vec_{kind}.bin"))
+    _evict(keep=key)
+    return index
+
+
+# -----------------------------
+# LRU eviction under disk budget
+# -----------------------------
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _evict(keep=None):
+    if not os.path.isdir(INDEX_DIR):
+        return
+
+    entries = []
+    for key in os.listdir(INDEX_DIR):
+        d = _entry_dir(key)
+        if not os.path.isdir(d):
+            continue
+        try:
+            entries.append((os.path.getmtime(d), key, _dir_size(d)))
+        except OSError:
+            continue
+
+    budget = MAX_DISK_MB * 1024 * 1024
+    total = sum(size for _, _, size in entries)
+
+    # oldest access first
+    for _, key, size in sorted(entries):
+        if total <= budget:
+            break
+        if key == keep:
+            continue
+        shutil.rmtree(_entry_dir(key), ignore_errors=True)
+        total -= size
+
+
+def clear():
+    shutil.rmtree(INDEX_DIR, ignore_errors=True)
+
+
+def stats():
+    if not os.path.isdir(INDEX_DIR):
+        return {"entries": 0, "bytes": 0}
+    keys = [k for k in os.listdir(INDEX_DIR) if os.path.isdir(_entry_dir(k))]
+    return {
+        "entries": len(keys),
+        "bytes": sum(_dir_size(_entry_dir(k)) for k in keys),
+        "checked_at": int(time.time()),
+    }
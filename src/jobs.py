@@ -0,0 +1,265 @@
+"""
+Local background job queue for batch runs.
+
+Jobs live in SQLite (.cache/jobs.db) and are executed by worker threads, either
+inside the Streamlit server process (start_workers) or in a separate process:
+
+    python -m src.jobs --workers 2
+
+Workers in one process share llm_client's concurrency limit and rate limiter,
+so several users queueing books never exceed the LLM budget. Each job streams
+its rows through src.batch.run_batch, so progress and partial results are
+visible while it runs and a restarted worker resumes from the checkpoint.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+import functools
+from contextlib import contextmanager
+
+from src import claims, tracing
+from src.batch import run_batch, checkpoint_path, run_settings
+from src.ingest import chunk_text, chunk_params
+
+JOBS_DB = os.path.join(".cache", "jobs.db")
+JOBS_DIR = os.path.join(".cache", "jobs")
+CHECKPOINT_DIR = "results/checkpoints"
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+STALE_AFTER = 300     # s without heartbeat before a "running" job is requeued
+HEARTBEAT_EVERY = 30  # s; a timer thread beats for the job's whole lifetime
+POLL_EVERY = 1.0
+
+# owner tokens of jobs running in this process; never requeued from here
+_active = set()
+_active_lock = threading.Lock()
+
+
+@contextmanager
+def _connect():
+    os.makedirs(os.path.dirname(JOBS_DB), exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        " id TEXT PRIMARY KEY,"
+        " book TEXT NOT NULL,"
+        " status TEXT NOT NULL,"          # queued | running | done | failed
+        " done INTEGER NOT NULL DEFAULT 0,"
+        " total INTEGER NOT NULL DEFAULT 0,"
+        " out_path TEXT NOT NULL,"
+        " params TEXT NOT NULL,"
+        " error TEXT,"
+        " created_at REAL NOT NULL,"
+        " started_at REAL,"
+        " heartbeat REAL,"
+        " owner TEXT)"                     # token of the worker running it
+    )
+    if "owner" not in {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}:
+        conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+    try:
+        with conn:  # one transaction per block
+            yield conn
+    finally:
+        conn.close()
+
+
+# -----------------------------
+# submit / inspect
+# -----------------------------
+def submit(book, story_text, rows, k=5, alpha=0.65, classify_mode="batch", backend="llm",
+           rerank=False, extractor=None):
+    """Queue a book; returns the job id (an identical unfinished job is reused)."""
+    rows = [(r[0].item() if hasattr(r[0], "item") else r[0], str(r[1])) for r in rows]
+    extractor = extractor or claims.CLAIM_EXTRACTOR
+    out_path = checkpoint_path(CHECKPOINT_DIR, book, story_text,
+                               *run_settings(k, alpha, classify_mode, backend, rerank, extractor))
+
+    with _connect() as conn:
+        existing = conn.execute(
+            "SELECT id FROM jobs WHERE out_path = ? AND status IN ('queued', 'running')",
+            (out_path,),
+        ).fetchone()
+        if existing:
+            return existing["id"]
+
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = os.path.join(JOBS_DIR, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        with open(os.path.join(job_dir, "story.txt"), "w", encoding="utf-8") as f:
+            f.write(story_text)
+        with open(os.path.join(job_dir, "rows.json"), "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+
+        params = {"k": k, "alpha": alpha, "classify_mode": classify_mode, "backend": backend,
+                  "rerank": rerank, "extractor": extractor}
+        conn.execute(
+            "INSERT INTO jobs (id, book, status, total, out_path, params, created_at)"
+            " VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, book, len(rows), out_path, json.dumps(params), time.time()),
+        )
+    return job_id
+
+
+def get(job_id):
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def list_jobs(limit=20):
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+# -----------------------------
+# workers
+# -----------------------------
+def _claim_next(owner):
+    """Claim the oldest queued job for owner; returns its id or None."""
+    with _connect() as conn:
+        # a worker that died mid-job stops beating -> hand the job out again.
+        # Live jobs beat every HEARTBEAT_EVERY s however slow their rows are.
+        cutoff = time.time() - STALE_AFTER
+        stale = conn.execute(
+            "SELECT id, owner FROM jobs WHERE status = 'running' AND heartbeat < ?", (cutoff,)
+        ).fetchall()
+        with _active_lock:
+            stale = [r for r in stale if r["owner"] not in _active]
+        for r in stale:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL"
+                " WHERE id = ? AND status = 'running' AND owner IS ? AND heartbeat < ?",
+                (r["id"], r["owner"], cutoff),
+            )
+        while True:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, heartbeat = ?, owner = ?"
+                " WHERE id = ? AND status = 'queued'",
+                (time.time(), time.time(), owner, row["id"]),
+            ).rowcount
+            if claimed:
+                return row["id"]
+
+
+def _beat(job_id, owner, stop):
+    while not stop.wait(HEARTBEAT_EVERY):
+        with _connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND owner = ?",
+                         (time.time(), job_id, owner))
+
+
+def _run(job_id, owner):
+    job = get(job_id)
+    params = json.loads(job["params"])
+    job_dir = os.path.join(JOBS_DIR, job_id)
+
+    beating = threading.Event()
+    threading.Thread(target=_beat, args=(job_id, owner, beating), daemon=True,
+                     name=f"job-heartbeat-{job_id}").start()
+    try:
+        with open(os.path.join(job_dir, "story.txt"), "r", encoding="utf-8") as f:
+            story = f.read()
+        with open(os.path.join(job_dir, "rows.json"), "r", encoding="utf-8") as f:
+            rows = json.load(f)
+
+        # one trace per job, appended to the tracing log when it ends
+        with tracing.run("job", job_id=job_id, book=job["book"], **params):
+            chunks = chunk_text(story)
+            failed = 0
+            for p in run_batch(chunks, rows, job["out_path"], job["book"],
+                               k=params["k"], alpha=params["alpha"],
+                               chunk_params=chunk_params(),
+                               classify_mode=params["classify_mode"],
+                               backend=params.get("backend", "llm"),
+                               rerank=params.get("rerank", False),
+                               extract_fn=functools.partial(
+                                   claims.extract_claims, strict=True,
+                                   extractor=params.get("extractor", claims.CLAIM_EXTRACTOR))):
+                failed += p["failed"]
+                with _connect() as conn:
+                    conn.execute(
+                        "UPDATE jobs SET done = ?, heartbeat = ? WHERE id = ? AND owner = ?",
+                        (p["done"], time.time(), job_id, owner),
+                    )
+
+        if failed:
+            # the rows were not checkpointed; queueing the book again retries them
+            raise RuntimeError(f"{failed} rows failed (LLM errors); queue the book again to retry")
+        with _connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'done', heartbeat = ? WHERE id = ? AND owner = ?",
+                         (time.time(), job_id, owner))
+    except Exception as e:
+        with _connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'failed', error = ? WHERE id = ? AND owner = ?",
+                         (f"{type(e).__name__}: {e}", job_id, owner))
+    finally:
+        beating.set()
+
+
+def _worker_loop(stop):
+    while not stop.is_set():
+        owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        with _active_lock:
+            _active.add(owner)
+        try:
+            job_id = _claim_next(owner)
+            if job_id is None:
+                stop.wait(POLL_EVERY)
+                continue
+            _run(job_id, owner)
+        finally:
+            with _active_lock:
+                _active.discard(owner)
+
+
+_started = False
+_start_lock = threading.Lock()
+
+def start_workers(n=JOB_WORKERS):
+    """Start n daemon worker threads in this process (once)."""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        stop = threading.Event()
+        for i in range(n):
+            threading.Thread(target=_worker_loop, args=(stop,), daemon=True,
+                             name=f"job-worker-{i}").start()
+        _started = True
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=JOB_WORKERS)
+    args = ap.parse_args()
+
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_worker_loop, args=(stop,), daemon=True)
+        for _ in range(args.workers)
+    ]
+    for t in threads:
+        t.start()
+    print(f"🚀 {args.workers} job workers polling {JOBS_DB}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop.set()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+
+# -----------------------------
+# SQLite (WAL) response cache
+#
+# One row per (model, system prompt, temperature, prompt) hash, so writes are
+# O(1), several processes / Streamlit sessions can share the file, and a
+# model change never serves answers from another model.
+# -----------------------------
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.db"))
+TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_HOURS", "0")) * 3600 or None
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "0")) or None
+EVICT_EVERY = 200  # writes between size checks
+
+
+def cache_key(model, system, temperature, prompt):
+    raw = json.dumps([model, system, temperature, prompt], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path=CACHE_PATH, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with self._conn() as c:
+            c.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " used_at REAL NOT NULL)"
+            )
+            c.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses(used_at)")
+
+    # sqlite connections can't be shared between threads
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, count=True):
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            now = time.time()
+            if row and self.ttl and now - row[1] > self.ttl:
+                with conn:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row:
+                with conn:
+                    conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            row = None
+
+        if count:
+            self._count(row is not None)
+        return row[0] if row else None
+
+    def set(self, key, response):
+        now = time.time()
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    (key, response, now, now),
+                )
+        except sqlite3.Error:
+            return  # cache save failure should not break app
+
+        with self._lock:
+            self.writes += 1
+            check = self.max_entries and self.writes % EVICT_EVERY == 1
+        if check:
+            self.evict()
+
+    def evict(self):
+        try:
+            conn = self._conn()
+            with conn:
+                if self.ttl:
+                    conn.execute(
+                        "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+                    )
+                if self.max_entries:
+                    # least recently used beyond the size bound
+                    conn.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        " SELECT key FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,),
+                    )
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        with self._conn() as c:
+            c.execute("DELETE FROM responses")
+
+    def stats(self):
+        try:
+            entries = self._conn().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": entries,
+        }
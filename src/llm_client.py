@@ -1,37 +1,171 @@
 import os
 import requests
 import time
-import json
+import random
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+from src import tracing
+from src.llm_cache import LLMCache, cache_key
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
-API_URL = "https://openrouter.ai/api/v1/chat/completions"
+API_URL = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
 MODEL = "mistralai/mistral-7b-instruct:free"
 
 # -----------------------------
-# Persistent Cache
+# Concurrency / rate limit settings
+# -----------------------------
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+RATE_PER_MIN = float(os.getenv("LLM_RATE_PER_MIN", "20"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+BACKOFF_BASE = 1.5   # seconds
+BACKOFF_CAP = 30.0   # seconds
+
+SYSTEM_PROMPT = "Answer briefly. If asked for JSON, return valid JSON only."
+TEMPERATURE = 0.2
+# evidence passages per claim, in batch and per-claim prompts alike (the
+# batch prompt's size is bounded by reasoning.BATCH_TOKEN_BUDGET)
+EVIDENCE_PER_CLAIM = 5
+
+# -----------------------------
+# Persistent Cache (see src/llm_cache.py)
+# -----------------------------
+_cache = LLMCache()
+
+def cache_stats():
+    return _cache.stats()
+
+# derived results (e.g. parsed claims) stored next to the raw responses;
+# lookups are not counted as LLM cache hits or misses
+def get_result(key):
+    return _cache.get(key, count=False)
+
+def set_result(key, value):
+    _cache.set(key, value)
+
+# -----------------------------
+# Pooled HTTP session
 # -----------------------------
-CACHE_FILE = "llm_cache.json"
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY))
+_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY))
+
+_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+# -----------------------------
+# Token bucket rate limiter
+# -----------------------------
+class TokenBucket:
+    def __init__(self, rate_per_min, capacity=None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity or max(1.0, min(MAX_CONCURRENCY, rate_per_min))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(min(wait, 1.0))
+
+    def pause(self, seconds):
+        # server told us to back off -> nobody sends until then
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+    def update_from_headers(self, headers):
+        retry_after = _parse_retry_after(headers.get("Retry-After"))
+        if retry_after is not None:
+            self.pause(retry_after)
+            return
+
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        try:
+            if int(float(remaining)) > 0:
+                return
+            reset = float(reset)
+        except ValueError:
+            return
+        # OpenRouter sends an epoch in ms, others send seconds-from-now
+        if reset > 1e12:
+            reset = reset / 1000.0 - time.time()
+        elif reset > 1e9:
+            reset = reset - time.time()
+        if reset > 0:
+            self.pause(reset)
+
 
-if os.path.exists(CACHE_FILE):
+def _parse_retry_after(value):
+    if value is None:
+        return None
     try:
-        with open(CACHE_FILE, "r") as f:
-            _CACHE = json.load(f)
-    except Exception:
-        _CACHE = {}
-else:
-    _CACHE = {}
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+_bucket = TokenBucket(RATE_PER_MIN)
+
+
+def share_budget(slots, n_processes):
+    """
+    Called in worker processes: use a cross-process semaphore for in-flight
+    requests and this process's share of the rate limit.
+    """
+    global _slots, _bucket
+    _slots = slots
+    _bucket = TokenBucket(RATE_PER_MIN / max(n_processes, 1))
+
+
+def _backoff(attempt):
+    # full jitter exponential backoff
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
 
 # -----------------------------
 # Main LLM Call
+#
+# ask_llm never raises: failures come back as "[LLM ERROR] ..." strings.
+# Callers that must not keep a failed answer (the batch engine) check
+# is_error() and raise LLMError themselves.
 # -----------------------------
+ERROR_PREFIX = "[LLM ERROR]"
+
+class LLMError(RuntimeError):
+    """The LLM could not answer; the work should be retried later."""
+
+def is_error(text):
+    return text.startswith(ERROR_PREFIX)
+
 def ask_llm(prompt: str) -> str:
+    tracing.count(llm_requests=1)
     if not OPENROUTER_API_KEY:
+        tracing.count(errors=1)
         return "[LLM ERROR] OPENROUTER_API_KEY not set"
 
     # ---- CACHE HIT ----
-    if prompt in _CACHE:
-        return _CACHE[prompt]
+    key = cache_key(MODEL, SYSTEM_PROMPT, TEMPERATURE, prompt)
+    cached = _cache.get(key)
+    if cached is not None:
+        tracing.count(cache_hits=1)
+        return cached
 
     headers = {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
@@ -45,25 +179,34 @@ def ask_llm(prompt: str) -> str:
         "messages": [
             {
                 "role": "system",
-                "content": "Answer briefly. If asked for JSON, return valid JSON only."
+                "content": SYSTEM_PROMPT
             },
             {
                 "role": "user",
                 "content": prompt
             }
         ],
-        "temperature": 0.2
+        "temperature": TEMPERATURE
     }
 
     # ---- RETRY LOGIC ----
-    for attempt in range(3):
+    for attempt in range(MAX_RETRIES):
+        if attempt:
+            tracing.count(retries=1)
         try:
-            r = requests.post(API_URL, headers=headers, json=payload, timeout=60)
+            _bucket.acquire()
+            with _slots:
+                t0 = time.perf_counter()
+                r = _session.post(API_URL, headers=headers, json=payload, timeout=60)
+                tracing.llm_latency(time.perf_counter() - t0)
 
-            # Rate limit → wait and retry
+            _bucket.update_from_headers(r.headers)
+
+            # Rate limit → limiter already paused on Retry-After, add jitter
             if r.status_code == 429:
-                wait = 3 * (attempt + 1)  # 3s, 6s, 9s
-                time.sleep(wait)
+                tracing.count(http_429=1)
+                if _parse_retry_after(r.headers.get("Retry-After")) is None:
+                    _bucket.pause(_backoff(attempt))
                 continue
 
             r.raise_for_status()
@@ -71,28 +214,50 @@ def ask_llm(prompt: str) -> str:
             data = r.json()
             text = data["choices"][0]["message"]["content"]
 
+            usage = data.get("usage") or {}
+            tracing.count(prompt_tokens=int(usage.get("prompt_tokens") or 0),
+                          completion_tokens=int(usage.get("completion_tokens") or 0))
+
             # ---- SAVE TO CACHE ----
-            _CACHE[prompt] = text
-            try:
-                with open(CACHE_FILE, "w") as f:
-                    json.dump(_CACHE, f)
-            except Exception:
-                pass  # cache save failure should not break app
+            _cache.set(key, text)
 
             return text
 
         except Exception as e:
-            if attempt == 2:
+            if attempt == MAX_RETRIES - 1:
+                tracing.count(errors=1)
                 return f"[LLM ERROR] {e}"
-            time.sleep(2)
+            time.sleep(_backoff(attempt))
 
+    tracing.count(errors=1)
     return "[LLM ERROR] Failed after retries"
 
 # -----------------------------
-# OPTIONAL: Batch Reasoning Helper
-# (use later if you want 3–5x speed)
+# Concurrent calls
 # -----------------------------
-def ask_llm_batch(claims, evidence_map):
+def ask_llm_many(prompts, max_workers=None):
+    """
+    Run many prompts concurrently. Results come back in input order;
+    duplicate prompts are only sent once.
+    """
+    prompts = list(prompts)
+    unique = list(dict.fromkeys(prompts))
+    if not unique:
+        return []
+
+    workers = min(max_workers or MAX_CONCURRENCY, len(unique))
+    # each call runs in a copy of the caller's context -> same tracing run
+    contexts = [contextvars.copy_context() for _ in unique]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        answers = dict(zip(unique, pool.map(lambda c, p: c.run(ask_llm, p), contexts, unique)))
+
+    return [answers[p] for p in prompts]
+
+# -----------------------------
+# Batch Reasoning Helper
+# (several claims per call, see reasoning.classify_many)
+# -----------------------------
+def build_batch_prompt(claims, evidence_map):
     """
     claims: list[str]
     evidence_map: dict[str, list[str]]
@@ -100,7 +265,7 @@ def ask_llm_batch(claims, evidence_map):
     prompt = "You are checking story consistency.\n\n"
 
     for i, c in enumerate(claims, 1):
-        ev = "\n".join(evidence_map.get(c, [])[:3])
+        ev = "\n".join(evidence_map.get(c, [])[:EVIDENCE_PER_CLAIM])
         prompt += f"""
 Claim {i}: {c}
 Evidence:
@@ -109,12 +274,14 @@ Decide SUPPORT / CONTRADICT / UNKNOWN.
 """
 
     prompt += """
-Return JSON:
+Return JSON with exactly one result per claim, in order:
 {
   "results": [
-    {"label": "SUPPORT|CONTRADICT|UNKNOWN", "reason": "short explanation"}
+    {"id": 1, "label": "SUPPORT|CONTRADICT|UNKNOWN", "reason": "short explanation"}
   ]
 }
 """
-    return ask_llm(prompt)
+    return prompt
 
+def ask_llm_batch(claims, evidence_map):
+    return ask_llm(build_batch_prompt(claims, evidence_map))
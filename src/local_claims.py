@@ -0,0 +1,109 @@
+import re
+import string
+
+from src.chunking import sentence_spans
+
+# -----------------------------
+# Local claim extraction (CPU, no model)
+#
+# sentences (shared segmenter, rejoined after "Mr." / "Dr." / initials) -> clauses at "; " / ", and|but|while ..." /
+# "and he|she ..." -> clauses without a subject borrow the sentence's ->
+# questions, hedged / modal / wishful and very short clauses are dropped.
+# Milliseconds per backstory; src/claims.py decides when the LLM is needed.
+# -----------------------------
+MIN_WORDS = 4
+
+_CLAUSE_SPLIT = re.compile(
+    r";\s+|,\s+(?:and|but|yet|so|while|whereas|although|though)\s+"
+    r"|\s+and\s+(?=(?:he|she|they|it|i|we|his|her|their)\s)",
+    re.I,
+)
+_NON_FACTUAL = re.compile(
+    r"\b(?:maybe|perhaps|probably|possibly|might|seems?|seemed"
+    r"|i think|i believe|hop(?:e|es|ed)|wish(?:es|ed)?|dream(?:s|ed|t)? of|want(?:s|ed)? to"
+    r"|imagin(?:e|es|ed)|if only)\b",
+    re.I,
+)
+_PRONOUNS = {"he", "she", "they", "i", "we", "it"}
+_SUBJECT_STARTS = _PRONOUNS | {
+    "the", "a", "an", "his", "her", "their", "its", "this", "that", "these", "those",
+    "my", "our", "there", "nobody", "everyone", "someone",
+}
+# capitalised words that open a sentence without being its subject
+_NOT_NAMES = {
+    "as", "during", "when", "while", "after", "before", "in", "on", "at", "by", "for",
+    "from", "with", "since", "although", "though", "because", "once", "later", "then",
+    "the", "a", "an", "this", "that", "these", "those", "his", "her", "their", "whenever",
+}
+# the shared segmenter ends a sentence at every period; these don't end one
+_TITLES = r"(?:Mr|Mrs|Ms|Dr|Prof|St|Capt|Col|Gen|Lt|Sgt|Rev|Hon)"
+_ABBREVIATION = re.compile(rf"(?:\b{_TITLES}|(?<![\w.])[A-HJ-Z])\.$")
+_STRIP = string.whitespace + ","
+# a name may open with a title and initials: "Dr. Rao", "Mr. J. Smith"
+_SUBJECT = re.compile(
+    rf"\b(?:(?:{_TITLES}\.\s+)?(?:[A-Z]\.\s+)*[A-Z][\w'’-]*(?:\s+[A-Z][\w'’-]*)*"
+    r"|he|she|they|i|we)\b"
+)
+
+
+def _subject(sentence):
+    """First name or personal pronoun of the sentence, if any."""
+    for m in _SUBJECT.finditer(sentence):
+        words = m.group(0).split()
+        while words and words[0].lower() in _NOT_NAMES:
+            words = words[1:]
+        if words:
+            return " ".join(words)
+    return None
+
+
+def _clauses(sentence):
+    parts = [p.strip(_STRIP) for p in _CLAUSE_SPLIT.split(sentence)]
+    parts = [p for p in parts if p]
+    subject = _subject(sentence) if len(parts) > 1 else None
+
+    out = []
+    for i, p in enumerate(parts):
+        first = p.split(maxsplit=1)[0]
+        # "..., and later moved to Delhi" -> "<subject> later moved to Delhi"
+        if i and subject and first.islower() and first.lower() not in _SUBJECT_STARTS:
+            p = f"{subject} {p}"
+        out.append(p)
+    return out
+
+
+def _clean(clause):
+    clause = clause.strip().rstrip(".!;:,").strip()
+    return clause[:1].upper() + clause[1:] + "." if clause else ""
+
+
+def _sentences(text):
+    spans = []
+    for s, e, _ in sentence_spans(text):
+        if spans and _ABBREVIATION.search(text[spans[-1][0]:spans[-1][1]]):
+            spans[-1] = (spans[-1][0], e)
+        else:
+            spans.append((s, e))
+    return [text[s:e] for s, e in spans]
+
+
+def segment(text):
+    """(claims, sentences, dropped) for one text; counts feed the fallback policy."""
+    claims, dropped = [], 0
+    sentences = _sentences(text or "")
+    for sent in sentences:
+        if sent.rstrip().endswith("?"):
+            dropped += 1
+            continue
+        for clause in _clauses(sent):
+            clause = _clean(clause)
+            if len(clause.split()) < MIN_WORDS or _NON_FACTUAL.search(clause):
+                dropped += 1
+                continue
+            claims.append(clause)
+    return list(dict.fromkeys(claims)), len(sentences), dropped
+
+
+def local_claims(text):
+    """Factual statements of a backstory, without an LLM."""
+    return segment(text)[0]
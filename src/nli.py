@@ -0,0 +1,121 @@
+import os
+import threading
+import numpy as np
+
+# -----------------------------
+# Local NLI cross-encoder (CPU)
+#
+# Scores (evidence, claim) pairs as entailment / contradiction / neutral.
+# A claim is SUPPORT or CONTRADICT when some evidence chunk entails or
+# contradicts it with probability >= NLI_MIN_PROB, else UNKNOWN.
+# sentence_transformers is imported on first use, like the embedder.
+#
+# NLI_ONNX_INT8=1 runs a dynamically int8-quantised ONNX export through
+# ONNX Runtime instead (needs optimum[onnxruntime]); the export is made once
+# and kept under .cache/nli_onnx/.
+# -----------------------------
+NLI_MODEL_NAME = os.getenv("NLI_MODEL", "cross-encoder/nli-deberta-v3-xsmall")
+NLI_MIN_PROB = float(os.getenv("NLI_MIN_PROB", "0.6"))
+NLI_ONNX_INT8 = os.getenv("NLI_ONNX_INT8", "0") == "1"
+NLI_BATCH_SIZE = 32
+ONNX_DIR = os.path.join(".cache", "nli_onnx")
+
+_model = None
+_labels = None
+_model_lock = threading.Lock()
+
+
+class _OnnxCrossEncoder:
+    """CrossEncoder.predict() over an int8 ONNX Runtime session."""
+
+    def __init__(self, name):
+        from transformers import AutoTokenizer
+        from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        out = os.path.join(ONNX_DIR, name.replace("/", "__"))
+        quantized = os.path.join(out, "model_quantized.onnx")
+        if not os.path.exists(quantized):
+            fp32 = ORTModelForSequenceClassification.from_pretrained(name, export=True)
+            fp32.save_pretrained(out)
+            AutoTokenizer.from_pretrained(name).save_pretrained(out)
+            ORTQuantizer.from_pretrained(fp32).quantize(
+                save_dir=out,
+                quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False),
+            )
+
+        self.tokenizer = AutoTokenizer.from_pretrained(out)
+        self.model = ORTModelForSequenceClassification.from_pretrained(
+            out, file_name="model_quantized.onnx"
+        )
+
+    def predict(self, pairs, batch_size=NLI_BATCH_SIZE, show_progress_bar=False):
+        logits = []
+        for i in range(0, len(pairs), batch_size):
+            a, b = zip(*pairs[i:i + batch_size])
+            enc = self.tokenizer(list(a), list(b), padding=True, truncation=True,
+                                 return_tensors="pt")
+            logits.append(self.model(**enc).logits.detach().numpy())
+        return np.concatenate(logits)
+
+
+def _get_model():
+    global _model, _labels
+    with _model_lock:
+        if _model is None:
+            if NLI_ONNX_INT8:
+                model = _OnnxCrossEncoder(NLI_MODEL_NAME)
+            else:
+                from sentence_transformers import CrossEncoder
+                model = CrossEncoder(NLI_MODEL_NAME, device="cpu")
+            id2label = getattr(getattr(model.model, "config", None), "id2label", None) or {
+                0: "contradiction", 1: "entailment", 2: "neutral"
+            }
+            _labels = [str(id2label[i]).lower() for i in range(len(id2label))]
+            _model = model
+        return _model, _labels
+
+def _softmax(x):
+    x = x - x.max(axis=1, keepdims=True)
+    e = np.exp(x)
+    return e / e.sum(axis=1, keepdims=True)
+
+def nli_classify(claims, evidence):
+    """
+    evidence: list of chunk lists aligned with claims.
+    All pairs go through the model in one batched predict call.
+    Returns (labels, reasons).
+    """
+    pairs, owner = [], []
+    for i, (claim, chunks) in enumerate(zip(claims, evidence)):
+        for ch in chunks:
+            pairs.append((ch, claim))
+            owner.append(i)
+
+    labels = ["UNKNOWN"] * len(claims)
+    reasons = ["No evidence found in story."] * len(claims)
+    if not pairs:
+        return labels, reasons
+
+    model, names = _get_model()
+    probs = _softmax(np.asarray(
+        model.predict(pairs, batch_size=NLI_BATCH_SIZE, show_progress_bar=False),
+        dtype=np.float32,
+    ))
+    ent, con = names.index("entailment"), names.index("contradiction")
+
+    owner = np.asarray(owner)
+    for i in range(len(claims)):
+        rows = probs[owner == i]
+        if not len(rows):
+            continue
+        best_ent, best_con = rows[:, ent].max(), rows[:, con].max()
+        if max(best_ent, best_con) < NLI_MIN_PROB:
+            reasons[i] = f"NLI: no chunk entails or contradicts the claim (p<{NLI_MIN_PROB:.2f})."
+        elif best_con > best_ent:
+            labels[i] = "CONTRADICT"
+            reasons[i] = f"NLI: contradicted by story evidence (p={best_con:.2f})."
+        else:
+            labels[i] = "SUPPORT"
+            reasons[i] = f"NLI: entailed by story evidence (p={best_ent:.2f})."
+    return labels, reasons
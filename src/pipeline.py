@@ -1,10 +1,24 @@
 import csv, os
-from ingest import get_chunks
-from retrieval import retrieve
-from claims import extract_claims
-from reasoning import classify, decide
+import argparse
+from src import tracing
+from src.ingest import get_chunks, chunk_params
+from src.retrieval import retrieve_many
+from src.claims import extract_claims
+from src.reasoning import classify, decide, gate
+from src.evidence import window_evidence
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--profile", action="store_true",
+                    help=f"print per-stage timings and LLM stats (always logged to {tracing.TRACE_LOG})")
+    args = ap.parse_args()
+
+    with tracing.run("pipeline") as trace:
+        run_pipeline()
+    if args.profile:
+        print(tracing.format_summary(trace.summary()))
+
+def run_pipeline():
     # Load story chunks
     story_chunks = get_chunks("data/stories/1_story.txt")
 
@@ -17,9 +31,15 @@ def main():
 
     labels, reasons = [], []
 
-    for c in claims:
-        evidence = retrieve(story_chunks, c, k=5)
-        l, r = classify(c, evidence)
+    hits = retrieve_many(story_chunks, claims, k=5, chunk_params=chunk_params(), with_scores=True)
+    # only the sentences closest to each claim go into the prompt
+    all_evidence, ev_stats = window_evidence(claims, [ev for ev, _ in hits])
+
+    # claims without relevant evidence are decided without the LLM
+    gated, gate_stats = gate(claims, all_evidence, [sc for _, sc in hits])
+
+    for c, evidence, g in zip(claims, all_evidence, gated):
+        l, r = g if g else classify(c, evidence)
 
         # add evidence strength tag
         r = f"[Evidence chunks: {len(evidence)}] {r}"
@@ -37,6 +57,8 @@ def main():
         w.writerow(["Story ID", "Prediction", "Rationale", "Claims Checked"])
         w.writerow([1, pred, rat, len(labels)])
 
+    print(f"✂️ evidence {ev_stats['tokens_before']} → {ev_stats['tokens_after']} prompt tokens")
+    print(f"⏭️ {gate_stats['unknown'] + gate_stats['nli']}/{gate_stats['checked']} claims skipped the LLM")
     print("✅ results/results.csv generated")
 
 if __name__ == "__main__":
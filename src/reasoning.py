@@ -1,5 +1,25 @@
-from src.llm_client import ask_llm
-import json, re
+from src.llm_client import ask_llm, ask_llm_many, build_batch_prompt, EVIDENCE_PER_CLAIM
+from src.tracing import traced
+import json, os, re
+
+# max (approx.) prompt tokens per multi-claim call in classify_many
+BATCH_TOKEN_BUDGET = int(os.getenv("CLASSIFY_TOKEN_BUDGET", "3000"))
+LABELS = {"SUPPORT", "CONTRADICT", "UNKNOWN"}
+
+# evidence gate: claims whose best raw retrieval score (retrieve_many with
+# with_scores=True) is below the threshold skip the LLM.
+#   "unknown" -> labelled UNKNOWN, "nli" -> local NLI cross-encoder, "off"
+# Off until a threshold calibrated with benchmarks/calibrate_gate.py is set.
+GATE_MODE = os.getenv("EVIDENCE_GATE", "off")
+GATE_THRESHOLD = float(os.getenv("EVIDENCE_GATE_THRESHOLD", "0.2"))
+GATE_MODES = ("off", "unknown", "nli")
+
+# who judges claim vs evidence: "llm" (OpenRouter) or "nli" (local CPU
+# cross-encoder, see src/nli.py); see the BACKENDS section below
+REASONING_BACKEND = os.getenv("REASONING_BACKEND", "llm")
+
+# reason given when the LLM answer could not be parsed (retry, don't cache)
+LLM_FAILED_REASON = "LLM could not judge this claim."
 
 TEMPLATE = """
 Claim:
@@ -30,13 +50,19 @@ def _extract_json(text: str):
         return None
 
 # ---------- CLASSIFY ----------
-def classify(claim, evidence_chunks):
+@traced("classify")
+def classify(claim, evidence_chunks, backend=None):
+    """(label, reason) for one claim from the selected backend."""
+    labels, reasons = get_backend(backend).classify_many([claim], [evidence_chunks])
+    return labels[0], reasons[0]
+
+def _llm_classify(claim, evidence_chunks):
     if not evidence_chunks:
         return "UNKNOWN", "No evidence found in story."
 
     prompt = TEMPLATE.format(
         claim=claim,
-        evidence="\n---\n".join(evidence_chunks[:5])
+        evidence="\n---\n".join(evidence_chunks[:EVIDENCE_PER_CLAIM])
     )
 
     raw = ask_llm(prompt)
@@ -45,17 +71,229 @@ def classify(claim, evidence_chunks):
 
     # STRICT fallback — never auto-support
     if not data:
-        return "UNKNOWN", "LLM could not judge this claim."
+        return "UNKNOWN", LLM_FAILED_REASON
 
     label = str(data.get("label", "UNKNOWN")).upper()
     reason = str(data.get("reason", "No explanation provided."))
 
-    if label not in {"SUPPORT", "CONTRADICT", "UNKNOWN"}:
+    if label not in LABELS:
         label = "UNKNOWN"
 
     return label, reason
 
 
+# ---------- EVIDENCE GATE ----------
+@traced("gate")
+def gate(claims, evidence, scores, mode=None, threshold=None):
+    """
+    Decide weakly-evidenced claims without the LLM.
+    Returns (results, stats): results[i] is (label, reason) for claims decided
+    here and None for claims that still need the LLM; stats counts them.
+    """
+    mode = mode or GATE_MODE
+    threshold = GATE_THRESHOLD if threshold is None else threshold
+    if mode not in GATE_MODES:
+        raise ValueError(f"Unknown gate mode: {mode}")
+
+    results = [None] * len(claims)
+    stats = {"checked": len(claims), "unknown": 0, "nli": 0}
+    if mode == "off" or scores is None:
+        return results, stats
+
+    weak = [i for i, sc in enumerate(scores) if not sc or max(sc) < threshold]
+    if not weak:
+        return results, stats
+
+    if mode == "nli":
+        from src.nli import nli_classify
+        labels, reasons = nli_classify([claims[i] for i in weak], [evidence[i] for i in weak])
+        for i, l, r in zip(weak, labels, reasons):
+            results[i] = (l, r)
+        stats["nli"] = len(weak)
+    else:
+        for i in weak:
+            best = max(scores[i]) if scores[i] else 0.0
+            results[i] = ("UNKNOWN", f"No relevant evidence (retrieval score {best:.2f}).")
+        stats["unknown"] = len(weak)
+    return results, stats
+
+
+# ---------- CLASSIFY MANY ----------
+def _approx_tokens(text):
+    # ~1.3 tokens per word is close enough for budgeting
+    return int(len(text.split()) * 1.3) + 1
+
+def _pack(claims, evidence_map, token_budget):
+    """Greedy groups of claims whose batch prompt fits the budget."""
+    groups, cur = [], []
+    for c in claims:
+        if cur and _approx_tokens(build_batch_prompt(cur + [c], evidence_map)) > token_budget:
+            groups.append(cur)
+            cur = []
+        cur.append(c)
+    if cur:
+        groups.append(cur)
+    return groups
+
+def _parse_batch(raw, n):
+    """results array -> {position: (label, reason)}; bad entries are left out."""
+    data = _extract_json(raw)
+    items = data.get("results") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return {}
+
+    out = {}
+    for pos, item in enumerate(items[:n]):
+        if not isinstance(item, dict):
+            continue
+        try:
+            i = int(item.get("id", pos + 1)) - 1
+        except (TypeError, ValueError):
+            i = pos
+        if not 0 <= i < n or i in out:
+            i = pos
+        label = str(item.get("label", "")).upper()
+        if label not in LABELS:
+            continue
+        out[i] = (label, str(item.get("reason", "No explanation provided.")))
+    return out
+
+@traced("classify_many")
+def classify_many(claims, evidence_map, token_budget=BATCH_TOKEN_BUDGET, backend=None):
+    """
+    Classify several claims at once with the selected backend: as few LLM
+    calls as fit the token budget, or one batched NLI pass.
+    Returns (labels, reasons) in claim order.
+    """
+    b = get_backend(backend)
+    if isinstance(b, LLMBackend):
+        return _llm_classify_many(claims, evidence_map, token_budget)
+    return b.classify_many(claims, [evidence_map.get(c, []) for c in claims])
+
+def _llm_classify_many(claims, evidence_map, token_budget):
+    # claims the model skipped or answered badly fall back to one call each
+    results = [None] * len(claims)
+
+    todo = []
+    for i, c in enumerate(claims):
+        if not evidence_map.get(c):
+            results[i] = ("UNKNOWN", "No evidence found in story.")
+        else:
+            todo.append(i)
+
+    groups = _pack([claims[i] for i in todo], evidence_map, token_budget)
+    raws = ask_llm_many([build_batch_prompt(g, evidence_map) for g in groups])
+
+    pos = 0
+    for group, raw in zip(groups, raws):
+        parsed = _parse_batch(raw, len(group))
+        for j in range(len(group)):
+            if j in parsed:
+                results[todo[pos + j]] = parsed[j]
+        pos += len(group)
+
+    # per-claim fallback only for what is still missing
+    missing = [i for i, r in enumerate(results) if r is None]
+    for i in missing:
+        results[i] = _llm_classify(claims[i], evidence_map.get(claims[i], []))
+
+    labels = [r[0] for r in results]
+    reasons = [r[1] for r in results]
+    return labels, reasons
+
+
+# ---------- EXTRACT + VERIFY (one call) ----------
+JOINT_TEMPLATE = """
+You are checking a character backstory against evidence from the story.
+
+Evidence passages:
+{passages}
+
+Backstory, sentence by sentence, with the passages closest to each:
+{sentences}
+
+List the factual claims the backstory makes and decide each one against the
+evidence passages only: SUPPORT / CONTRADICT / UNKNOWN.
+
+Return JSON exactly in this format:
+{{
+  "results": [
+    {{"claim": "claim text", "label": "SUPPORT|CONTRADICT|UNKNOWN", "reason": "short explanation"}}
+  ]
+}}
+"""
+
+def build_joint_prompt(sentences, evidence):
+    """Passages shared by several sentences are listed once and referenced by number."""
+    ids, passages, lines = {}, [], []
+    for i, (sent, ev) in enumerate(zip(sentences, evidence), 1):
+        refs = []
+        for p in ev:
+            if p not in ids:
+                ids[p] = len(ids) + 1
+                passages.append(f"[{ids[p]}] {p}")
+            refs.append(str(ids[p]))
+        lines.append(f"S{i}: {sent} (passages: {', '.join(refs) or 'none'})")
+    return JOINT_TEMPLATE.format(passages="\n".join(passages) or "(none)",
+                                 sentences="\n".join(lines))
+
+def _parse_joint(raw):
+    data = _extract_json(raw)
+    items = data.get("results") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return None
+
+    claims, labels, reasons = [], [], []
+    for item in items:
+        if not isinstance(item, dict) or not str(item.get("claim", "")).strip():
+            continue
+        label = str(item.get("label", "")).upper()
+        claims.append(str(item["claim"]).strip())
+        labels.append(label if label in LABELS else "UNKNOWN")
+        reasons.append(str(item.get("reason", "No explanation provided.")))
+    return (claims, labels, reasons) if claims else None
+
+@traced("extract_verify")
+def extract_and_verify(sentences, evidence):
+    """
+    One LLM call that lists the backstory's claims and labels them against
+    the evidence retrieved for each backstory sentence.
+    Returns (claims, labels, reasons), or None when the answer is unusable
+    (callers then fall back to extract_claims + classify).
+    """
+    if not sentences:
+        return None
+    return _parse_joint(ask_llm(build_joint_prompt(sentences, evidence)))
+
+
+# ---------- BACKENDS ----------
+class LLMBackend:
+    """One OpenRouter call per claim (see classify_many for packed calls)."""
+    name = "llm"
+
+    def classify_many(self, claims, evidence):
+        results = [_llm_classify(c, ev) for c, ev in zip(claims, evidence)]
+        return [r[0] for r in results], [r[1] for r in results]
+
+
+class NLIBackend:
+    """Local NLI cross-encoder: all claim-evidence pairs in one CPU batch."""
+    name = "nli"
+
+    def classify_many(self, claims, evidence):
+        from src.nli import nli_classify
+        return nli_classify(claims, evidence)
+
+
+BACKENDS = {"llm": LLMBackend(), "nli": NLIBackend()}
+
+def get_backend(name=None):
+    name = name or REASONING_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown reasoning backend: {name}")
+    return BACKENDS[name]
+
+
 # ---------- DECIDE ----------
 def decide(labels, reasons):
     support = labels.count("SUPPORT")
@@ -1,7 +1,8 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-
 def generate_pdf(filename, prediction, confidence, rationale, rows):
+    # imported here so the app doesn't pay for reportlab until a PDF is needed
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
     c = canvas.Canvas(filename, pagesize=A4)
     w, h = A4
     y = h - 40
@@ -0,0 +1,46 @@
+import os
+import threading
+import numpy as np
+
+# -----------------------------
+# Second-stage re-ranker
+#
+# A cross-encoder reads query and chunk together, so it ranks far better than
+# the bi-encoder + TF-IDF blend, but costs one forward pass per pair. It only
+# ever sees the top RERANK_CANDIDATES hybrid hits of each claim, and all pairs
+# of all claims go through the model in one batched predict call.
+# -----------------------------
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BATCH_SIZE = 64
+
+_model = None
+_model_lock = threading.Lock()
+
+def _get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import CrossEncoder
+            _model = CrossEncoder(RERANK_MODEL_NAME, device="cpu")
+        return _model
+
+def rerank(queries, candidates, k):
+    """
+    candidates: list of chunk-text lists aligned with queries.
+    Returns, per query, the positions of its k best candidates (best first).
+    """
+    pairs = [(q, c) for q, cands in zip(queries, candidates) for c in cands]
+    if not pairs:
+        return [[] for _ in queries]
+
+    scores = np.asarray(
+        _get_model().predict(pairs, batch_size=RERANK_BATCH_SIZE, show_progress_bar=False),
+        dtype=np.float32,
+    )
+
+    out, pos = [], 0
+    for cands in candidates:
+        s = scores[pos:pos + len(cands)]
+        pos += len(cands)
+        out.append(np.argsort(-s, kind="stable")[:k].tolist())
+    return out
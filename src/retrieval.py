@@ -1,69 +1,339 @@
 import os
-import pickle
+import threading
+from collections import OrderedDict
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
-CACHE_DIR = ".cache"
+from src import index_store, embed_server, tfidf, tracing
+
+# sentence_transformers (torch) and sklearn are imported lazily: importing this
+# module stays cheap for the Streamlit app and CLIs until retrieval runs.
+
 EMB_MODEL_NAME = "all-MiniLM-L6-v2"
-os.makedirs(CACHE_DIR, exist_ok=True)
 
+# dense index behind retrieve: "exact" (brute force), "hnsw" or "ivf"
+VECTOR_INDEX = os.getenv("RETRIEVAL_INDEX", "exact")
+# below this many chunks brute force is already fast -> always exact
+ANN_MIN_CHUNKS = int(os.getenv("ANN_MIN_CHUNKS", "2000"))
+# candidates per modality gathered from the ANN / sparse paths
+ANN_CANDIDATES = 100
+# optional second stage: re-rank the top-N hybrid hits with a cross-encoder
+RERANK = os.getenv("RETRIEVAL_RERANK", "0") == "1"
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+
+# job worker threads share this process with the UI sessions: every
+# module-level cache below is guarded by a lock
 _model = None
+_model_lock = threading.Lock()
 def _get_model():
     global _model
-    if _model is None:
-        _model = SentenceTransformer(EMB_MODEL_NAME)
-    return _model
-
-def _cache_path(key: str):
-    return os.path.join(CACHE_DIR, f"{key}.pkl")
-
-def _load_cache(key: str):
-    p = _cache_path(key)
-    if os.path.exists(p):
-        with open(p, "rb") as f:
-            return pickle.load(f)
-    return None
-
-def _save_cache(key: str, obj):
-    with open(_cache_path(key), "wb") as f:
-        pickle.dump(obj, f)
-
-def _get_embeddings(chunks, cache_key="chunks_emb"):
-    cached = _load_cache(cache_key)
-    if cached is not None:
-        return cached
-    model = _get_model()
-    vecs = model.encode(chunks, show_progress_bar=False)
-    _save_cache(cache_key, vecs)
-    return vecs
-
-def _get_tfidf(chunks, cache_key="chunks_tfidf"):
-    cached = _load_cache(cache_key)
-    if cached is not None:
-        return cached
-    vectorizer = TfidfVectorizer(stop_words="english")
-    X = vectorizer.fit_transform(chunks)
-    _save_cache(cache_key, (vectorizer, X))
-    return vectorizer, X
-
-def retrieve(chunks, query, k=5, alpha=0.65):
-    emb_chunks = _get_embeddings(chunks, cache_key="chunks_emb")
-    model = _get_model()
-    q_emb = model.encode([query])
-    sim_emb = cosine_similarity(q_emb, emb_chunks)[0]
-
-    vectorizer, X = _get_tfidf(chunks, cache_key="chunks_tfidf")
-    q_tfidf = vectorizer.transform([query])
-    sim_tfidf = cosine_similarity(q_tfidf, X)[0]
-
-    def _norm(x):
-        if x.max() - x.min() < 1e-9:
-            return x
-        return (x - x.min()) / (x.max() - x.min())
-
-    sim = alpha * _norm(sim_emb) + (1 - alpha) * _norm(sim_tfidf)
-    top_idx = np.argsort(sim)[::-1][:k]
-    return [chunks[i] for i in top_idx]
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import SentenceTransformer
+            _model = SentenceTransformer(EMB_MODEL_NAME)
+        return _model
+
+def _encode(texts):
+    """Embed via the warm embedding server when running, else in-process."""
+    if _model is None and embed_server.available():
+        try:
+            return embed_server.encode_remote(texts, EMB_MODEL_NAME)
+        except (OSError, RuntimeError, ValueError):
+            pass  # server gone / wrong model -> load locally
+    vecs = _get_model().encode(list(texts), show_progress_bar=False)
+    return np.asarray(vecs, dtype=np.float32)
+
+@tracing.traced("embed")
+def embed(texts):
+    """Unit-length embeddings of arbitrary texts (claims, queries)."""
+    vecs = _encode(texts)
+    return vecs / np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+
+# in-process view of the last few indexes (disk store is the source of truth)
+_LOADED = OrderedDict()
+_LOADED_MAX = 4
+_loaded_lock = threading.Lock()
+_build_lock = threading.Lock()  # one bundle build / load at a time
+
+def _index_key(chunks, chunk_params=None):
+    return index_store.index_key(chunks, EMB_MODEL_NAME, chunk_params)
+
+def _build_info(n, embedded=0, reused=None, cached=True):
+    # what getting an index had to compute, e.g. "re-embedded 2 of 40 chunks"
+    return {"chunks": n, "embedded": embedded, "reused": n if reused is None else reused,
+            "cached": cached}
+
+def _build_rows(chunks, key, hashes):
+    """
+    Embeddings + term counts (+ build info) for a new index. Rows for chunks
+    that already exist in a recent index are copied; only new / edited chunks
+    are encoded.
+    """
+    from scipy import sparse
+
+    found = index_store.reusable_rows(EMB_MODEL_NAME, hashes, exclude=key)
+
+    by_entry = {}
+    for i, h in enumerate(hashes):
+        if h in found:
+            entry, row = found[h]
+            by_entry.setdefault(entry, []).append((i, row))
+
+    positions, emb_blocks, count_blocks = [], [], []
+    reused = set()
+    for entry, pairs in by_entry.items():
+        e_emb = index_store.load_embeddings(entry)
+        e_counts = index_store.load_counts(entry, tfidf.N_FEATURES)
+        if e_emb is None or e_counts is None:
+            continue  # evicted meanwhile -> those chunks count as new
+        pos = [i for i, _ in pairs]
+        rows = [r for _, r in pairs]
+        positions += pos
+        emb_blocks.append(np.asarray(e_emb[rows], dtype=np.float32))
+        count_blocks.append(e_counts[rows])
+        reused.update(pos)
+
+    missing = [i for i in range(len(chunks)) if i not in reused]
+    if missing:
+        texts = [chunks[i] for i in missing]
+        positions += missing
+        emb_blocks.append(embed(texts))  # stored unit-length: cosine = dot product
+        count_blocks.append(tfidf.term_counts(texts))
+
+    order = np.argsort(positions, kind="stable")
+    emb = np.concatenate(emb_blocks)[order]
+    counts = sparse.vstack(count_blocks).tocsr()[order]
+
+    return emb, counts, _build_info(len(chunks), len(missing), len(reused), cached=False)
+
+def _cached_index(key):
+    with _loaded_lock:
+        index = _LOADED.get(key)
+        if index is not None:
+            _LOADED.move_to_end(key)  # mark most recent
+        return index
+
+def _get_index(chunks, chunk_params=None, spans=None):
+    return _get_index_info(chunks, chunk_params, spans)[0]
+
+def _get_index_info(chunks, chunk_params=None, spans=None):
+    """(index, build info of this call); nothing is shared between callers."""
+    key = _index_key(chunks, chunk_params)
+    index = _cached_index(key)
+    if index is not None:
+        return index, _build_info(len(chunks))
+    with _build_lock:
+        # another thread may have loaded it while we waited
+        index = _cached_index(key)
+        if index is not None:
+            return index, _build_info(len(chunks))
+        return _load_or_build(chunks, key, chunk_params, spans)
+
+def _load_or_build(chunks, key, chunk_params, spans):
+    n_features = tfidf.N_FEATURES
+    manifest = index_store.load_manifest(key)
+    emb_chunks = index_store.load_embeddings(key) if manifest else None
+    stored = index_store.load_tfidf(key, n_features) if manifest else None
+
+    if emb_chunks is None or stored is None:
+        with tracing.stage("index_build"):
+            info = _build_and_save(chunks, key, chunk_params, spans, n_features)
+        emb_chunks = index_store.load_embeddings(key)
+        stored = index_store.load_tfidf(key, n_features)
+    else:
+        info = _build_info(len(chunks))
+
+    idf, X = stored
+    index = (emb_chunks, tfidf.HashedTfidf(idf), X)
+    with _loaded_lock:
+        _LOADED[key] = index
+        while len(_LOADED) > _LOADED_MAX:
+            _LOADED.popitem(last=False)
+    return index, info
+
+def _build_and_save(chunks, key, chunk_params, spans, n_features):
+    hashes = [index_store.chunk_hash(c) for c in chunks]
+    emb, counts, info = _build_rows(chunks, key, hashes)
+
+    # IDF is one pass over the non-zeros -> no refit, no stored vectorizer
+    idf = tfidf.idf_from_counts(counts)
+    index_store.save_embeddings(key, emb)
+    index_store.save_counts(key, counts)
+    index_store.save_tfidf(key, idf, tfidf.HashedTfidf(idf).weigh(counts))
+    index_store.save_chunks(key, chunks, spans)
+    # manifest last: it marks the bundle complete and its rows reusable
+    index_store.save_manifest(key, {
+        "model": EMB_MODEL_NAME,
+        "dim": int(emb.shape[1]) if emb.ndim == 2 else 0,
+        "dtype": index_store.EMB_DTYPE,
+        "normalized": True,
+        "n_chunks": len(chunks),
+        "n_features": n_features,
+        "chunker": chunk_params or {},
+        "hashes": hashes,
+    })
+    return info
+
+def build_index(chunks, chunk_params=None, spans=None):
+    """
+    Build (or find) the on-disk bundle for these chunks. Returns (key, info),
+    info = {"chunks", "embedded", "reused", "cached"} for this call.
+    """
+    info = _get_index_info(chunks, chunk_params, spans)[1]
+    return _index_key(chunks, chunk_params), info
+
+_VECTOR_INDEXES = OrderedDict()
+_vector_lock = threading.Lock()
+
+def _get_vector_index(chunks, chunk_params, kind):
+    key = _index_key(chunks, chunk_params)
+    with _vector_lock:
+        index = _VECTOR_INDEXES.get((key, kind))
+        if index is not None:
+            _VECTOR_INDEXES.move_to_end((key, kind))
+            return index
+    emb_chunks = _get_index(chunks, chunk_params)[0]
+    index = index_store.load_vector_index(key, kind, emb_chunks)
+    with _vector_lock:
+        _VECTOR_INDEXES[(key, kind)] = index
+        while len(_VECTOR_INDEXES) > _LOADED_MAX:
+            _VECTOR_INDEXES.popitem(last=False)
+    return index
+
+# ---------- SCORING ----------
+# (queries x chunks) score matrices live in per-thread buffers that are reused
+# across calls; min-max and blending happen in place.
+_buffers = threading.local()
+
+def _buffer(name, shape):
+    size = shape[0] * shape[1]
+    buf = getattr(_buffers, name, None)
+    if buf is None or buf.size < size:
+        buf = np.empty(size, dtype=np.float32)
+        setattr(_buffers, name, buf)
+    return buf[:size].reshape(shape)
+
+def _minmax_rows_(x):
+    # per-query min-max in place; rows with a flat score profile are left as-is
+    lo = x.min(axis=1, keepdims=True)
+    span = x.max(axis=1, keepdims=True) - lo
+    flat = span < 1e-9
+    lo[flat], span[flat] = 0.0, 1.0
+    x -= lo
+    x /= span
+
+def _top_k(sim, k):
+    n = sim.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((sim.shape[0], 0), dtype=int)
+    if k < n:
+        part = np.argpartition(sim, n - k, axis=1)[:, n - k:]
+    else:
+        part = np.broadcast_to(np.arange(n), sim.shape)
+    order = np.argsort(-np.take_along_axis(sim, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+def _minmax(x):
+    span = x.max() - x.min()
+    return x if span < 1e-9 else (x - x.min()) / span
+
+def _hybrid_top_k(q_unit, emb_unit, q_tfidf, X, k, alpha):
+    """
+    Top-k chunk ids per query and their raw blended scores.
+    q_unit / emb_unit are L2-normalised, so the dense product is the cosine.
+    """
+    shape = (q_unit.shape[0], emb_unit.shape[0])
+    dense = _buffer("dense", shape)
+    np.matmul(q_unit, emb_unit.T, out=dense)
+
+    # TF-IDF rows are already L2-normalised -> dot product is cosine
+    sparse = (q_tfidf @ X.T).tocsr()
+    lexical = sparse.toarray(out=_buffer("lexical", shape))
+
+    _minmax_rows_(dense)
+    _minmax_rows_(lexical)
+    dense *= alpha
+    lexical *= 1 - alpha
+    dense += lexical
+    top = _top_k(dense, k)
+
+    if not top.size:
+        return top, np.zeros(top.shape, dtype=np.float32)
+
+    # raw (un-normalised) scores only for the k winners
+    picked = np.asarray(emb_unit[top.ravel()], dtype=np.float32).reshape(*top.shape, -1)
+    raw_dense = np.einsum("qd,qkd->qk", q_unit, picked)
+    rows = np.repeat(np.arange(top.shape[0]), top.shape[1])
+    raw_lexical = np.asarray(sparse[rows, top.ravel()]).reshape(top.shape)
+    return top, alpha * raw_dense + (1 - alpha) * raw_lexical
+
+def _retrieve_ann(chunks, queries, q_emb, k, alpha, chunk_params, kind):
+    """
+    Hybrid scoring restricted to candidates: ANN top-N dense hits plus the
+    top-N TF-IDF hits (the sparse product only touches chunks sharing terms).
+    """
+    emb_chunks, vectorizer, X = _get_index(chunks, chunk_params)
+    n = max(ANN_CANDIDATES, k)
+
+    _, dense_ids = _get_vector_index(chunks, chunk_params, kind).search(q_emb, n)
+    sparse = (vectorizer.transform(queries) @ X.T).tocsr()
+
+    out = []
+    for qi in range(len(queries)):
+        row = sparse.getrow(qi)
+        top_sparse = row.indices[np.argsort(-row.data)[:n]]
+        cand = np.union1d(dense_ids[qi][dense_ids[qi] >= 0], top_sparse)
+
+        sim_emb = np.asarray(emb_chunks[cand], dtype=np.float32) @ q_emb[qi]
+        sim_tfidf = row.toarray()[0][cand]
+
+        sim = alpha * _minmax(sim_emb) + (1 - alpha) * _minmax(sim_tfidf)
+        top = _top_k(sim[None, :], k)[0]
+        out.append((cand[top], alpha * sim_emb[top] + (1 - alpha) * sim_tfidf[top]))
+    return out
+
+def _retrieve_exact(chunks, queries, q_emb, k, alpha, chunk_params):
+    emb_chunks, vectorizer, X = _get_index(chunks, chunk_params)
+    top, raw = _hybrid_top_k(q_emb, emb_chunks, vectorizer.transform(queries), X, k, alpha)
+    return list(zip(top, raw))
+
+@tracing.traced("retrieve")
+def retrieve_many(chunks, queries, k=5, alpha=0.65, chunk_params=None, index=None,
+                  with_scores=False, rerank=None):
+    """
+    Top-k chunks for every query: one encoder batch, one matmul per modality.
+
+    Ranking uses per-query min-max normalised scores, which always put the best
+    chunk near 1. with_scores=True returns (chunks, scores) per query instead,
+    where scores are the raw blend alpha * cosine + (1 - alpha) * tfidf of each
+    chunk; those are comparable across queries (see reasoning.gate).
+
+    rerank (default RETRIEVAL_RERANK) takes the top RERANK_CANDIDATES hybrid
+    hits and keeps the k a cross-encoder likes best (see src/rerank.py).
+    """
+    queries = list(queries)
+    if not queries or not chunks:
+        return [([], []) if with_scores else [] for _ in queries]
+
+    kind = index or VECTOR_INDEX
+    rerank = RERANK if rerank is None else rerank
+    n = max(RERANK_CANDIDATES, k) if rerank else k
+    q_emb = embed(queries)
+
+    if kind != "exact" and len(chunks) >= ANN_MIN_CHUNKS:
+        hits = _retrieve_ann(chunks, queries, q_emb, n, alpha, chunk_params, kind)
+    else:
+        hits = _retrieve_exact(chunks, queries, q_emb, n, alpha, chunk_params)
+
+    if rerank:
+        from src.rerank import rerank as cross_rerank
+        order = cross_rerank(queries, [[chunks[i] for i in ids] for ids, _ in hits], k)
+        hits = [(ids[o], raw[o]) for (ids, raw), o in zip(hits, order)]
+
+    out = [([chunks[i] for i in ids], raw.tolist()) for ids, raw in hits]
+    return out if with_scores else [c for c, _ in out]
 
+def retrieve(chunks, query, k=5, alpha=0.65, chunk_params=None, index=None, with_scores=False,
+             rerank=None):
+    return retrieve_many(chunks, [query], k=k, alpha=alpha, chunk_params=chunk_params,
+                         index=index, with_scores=with_scores, rerank=rerank)[0]
@@ -0,0 +1,157 @@
+"""
+Run a whole hackathon CSV across all novels in parallel, one book per process.
+
+    python -m src.run_books --csv test.csv --novels data/novels --workers 4
+
+Each worker loads its own embedding model and story index; all workers share
+one LLM concurrency budget. Rows are checkpointed per book (see src/batch.py),
+so an interrupted run picks up where it stopped. Every book is traced
+separately (src/tracing.py); --profile prints each book's report.
+"""
+import os
+import time
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from src import claims, llm_client, tracing
+from src.batch import run_batch, checkpoint_path, split_by_book, run_settings
+from src.ingest import chunk_text, chunk_params
+from src.format_submission import to_submission
+
+CHECKPOINT_DIR = "results/checkpoints"
+
+
+def _normalize(name):
+    return "".join(ch for ch in str(name).lower() if ch.isalnum())
+
+
+def find_novel(novels_dir, book_name):
+    """<novels_dir>/<book_name>.txt, tolerant to case / spaces / punctuation."""
+    want = _normalize(book_name)
+    for fname in os.listdir(novels_dir):
+        stem, ext = os.path.splitext(fname)
+        if ext.lower() == ".txt" and _normalize(stem) == want:
+            return os.path.join(novels_dir, fname)
+    return None
+
+
+def _init_worker(slots, n_processes):
+    llm_client.share_budget(slots, n_processes)
+
+
+def process_book(book_name, story_path, rows, k, alpha, classify_mode, dedup=True, backend="llm",
+                 rerank=False):
+    with open(story_path, "r", encoding="utf-8") as f:
+        story = f.read()
+    chunks = chunk_text(story)
+
+    out_path = checkpoint_path(CHECKPOINT_DIR, book_name, story,
+                               *run_settings(k, alpha, classify_mode, backend, rerank,
+                                             claims.CLAIM_EXTRACTOR, dedup))
+    records, stats, gate_stats, ev_stats = [], {}, {}, {}
+    failed = 0
+    with tracing.run("book", book=book_name, backend=backend, classify=classify_mode,
+                     rerank=rerank) as trace:
+        for p in run_batch(chunks, rows, out_path, book_name, k=k, alpha=alpha,
+                           chunk_params=chunk_params(), classify_mode=classify_mode, dedup=dedup,
+                           backend=backend, rerank=rerank):
+            if p["failed"]:
+                failed += 1
+            else:
+                records.append(p["record"])
+            stats, gate_stats, ev_stats = p["dedup"], p["gate"], p["evidence"]
+    return book_name, records, failed, stats, gate_stats, ev_stats, trace.summary()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", required=True, help="test.csv / train.csv with book_name column")
+    ap.add_argument("--novels", required=True, help="directory of <book_name>.txt files")
+    ap.add_argument("--workers", type=int, default=min(os.cpu_count() or 1, 4))
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--alpha", type=float, default=0.65)
+    ap.add_argument("--classify", choices=["batch", "per-claim", "joint"], default="batch",
+                    help="joint: one LLM call extracts and labels the claims of a backstory")
+    ap.add_argument("--backend", choices=["llm", "nli"], default="llm",
+                    help="OpenRouter LLM, or the local CPU NLI cross-encoder (offline)")
+    ap.add_argument("--rerank", action="store_true",
+                    help="re-rank the top hybrid hits with a cross-encoder before keeping k")
+    ap.add_argument("--no-dedup", action="store_true",
+                    help="resolve every claim even if an earlier backstory had a near-duplicate")
+    ap.add_argument("--extractor", choices=claims.CLAIM_EXTRACTORS, default=claims.CLAIM_EXTRACTOR,
+                    help="claim extraction: LLM, local CPU only, or local with LLM fallback")
+    ap.add_argument("--profile", action="store_true",
+                    help=f"print per-stage timings and LLM stats per book (always logged to {tracing.TRACE_LOG})")
+    ap.add_argument("--out", default="results/batch_results.csv")
+    ap.add_argument("--submission", default="final_submission.csv")
+    args = ap.parse_args()
+
+    df = pd.read_csv(args.csv)
+    text_col = "content" if "content" in df.columns else "backstory"
+
+    jobs = []
+    for book, df_book in split_by_book(df).items():
+        story_path = find_novel(args.novels, book)
+        if story_path is None:
+            print(f"⚠️ No novel found for '{book}' in {args.novels} — skipped")
+            continue
+        rows = list(zip(df_book["id"].tolist(), df_book[text_col].astype(str).tolist()))
+        jobs.append((book, story_path, rows))
+
+    if not jobs:
+        print("❌ Nothing to do")
+        return
+
+    workers = max(1, min(args.workers, len(jobs)))
+
+    os.environ["CLAIM_EXTRACTOR"] = args.extractor  # read by the spawned workers
+
+    # keep torch from oversubscribing cores when several workers encode at once
+    os.environ.setdefault("OMP_NUM_THREADS", str(max(1, (os.cpu_count() or 1) // workers)))
+
+    ctx = mp.get_context("spawn")
+    manager = ctx.Manager()
+    slots = manager.BoundedSemaphore(llm_client.MAX_CONCURRENCY)
+
+    all_records = []
+    t0 = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(slots, workers)) as pool:
+        futures = [
+            pool.submit(process_book, book, path, rows, args.k, args.alpha, args.classify,
+                        not args.no_dedup, args.backend, args.rerank)
+            for book, path, rows in jobs
+        ]
+        for fut in as_completed(futures):
+            book, records, failed, stats, gate_stats, ev_stats, trace = fut.result()
+            all_records += records
+            reused = stats.get("exact_reuse", 0) + stats.get("semantic_reuse", 0)
+            gated = gate_stats.get("unknown", 0) + gate_stats.get("nli", 0)
+            print(f"✅ {book}: {len(records)} backstories, {reused}/{stats.get('claims', 0)} "
+                  f"claims reused, {gated} skipped the LLM, evidence "
+                  f"{ev_stats.get('tokens_before', 0)} → {ev_stats.get('tokens_after', 0)} tokens "
+                  f"({time.perf_counter() - t0:.1f}s)")
+            if failed:
+                print(f"⚠️ {book}: {failed} backstories failed (LLM errors), not saved; "
+                      "rerun to retry them")
+            if args.profile:
+                print(tracing.format_summary(trace))
+
+    manager.shutdown()
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    out = pd.DataFrame(all_records)
+    out.to_csv(args.out, index=False)
+    to_submission(out).to_csv(args.submission, index=False)
+
+    print(f"⏱️ {len(out)} backstories from {len(jobs)} books in "
+          f"{time.perf_counter() - t0:.1f}s with {workers} workers")
+    print(f"✅ {args.out} and {args.submission} created")
+
+
+if __name__ == "__main__":
+    main()
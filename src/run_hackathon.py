@@ -1,74 +1,132 @@
+import time
+import argparse
 import pandas as pd
-from src.claims import extract_claims
-from src.reasoning import classify, decide, confidence_score
-from src.retrieval import retrieve
+from src import claims, tracing
+from src.batch import run_batch, checkpoint_path, load_results, run_settings
+from src.ingest import chunk_text, chunk_params
+
+CHECKPOINT_DIR = "results/checkpoints"
 
 def load_text(path):
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
 
-def chunk_text(text, size=800):
-    return [text[i:i+size] for i in range(0, len(text), size)]
-
-def process_story_with_backstories(story_path, backstory_csv, story_name):
+def iter_story_with_backstories(story_path, backstory_csv, story_name, classify_mode="batch",
+                                dedup=True, backend="llm", rerank=False):
+    """
+    Streams progress for one story; finished rows are checkpointed, so
+    re-running after a crash continues where it stopped.
+    """
     story = load_text(story_path)
     chunks = chunk_text(story)
 
     df = pd.read_csv(backstory_csv)
-    results = []
-
-    for _, row in df.iterrows():
-        bid = row["id"]
-        backstory_text = row["backstory"]
-
-        claims = extract_claims(backstory_text)
-
-        labels, reasons = [], []
-
-        for c in claims:
-            ev = retrieve(chunks, c, k=5, alpha=0.6)
-            l, r = classify(c, ev)
-            labels.append(l)
-            reasons.append(r)
-
-        # safety
-        if not labels:
-            labels = ["UNKNOWN"]
-            reasons = ["No claims found"]
-
-        pred, rat = decide(labels, reasons)
-        conf = confidence_score(labels)
-
-        results.append({
-            "story": story_name,
-            "backstory_id": bid,
-            "prediction": "consistent" if pred == 1 else "inconsistent",
-            "confidence": conf
-        })
-
+    k = 3 if rerank else 5  # re-ranked evidence is tighter -> fewer chunks per prompt
+    out_path = checkpoint_path(CHECKPOINT_DIR, story_name, story,
+                               *run_settings(k, 0.6, classify_mode, backend, rerank,
+                                             claims.CLAIM_EXTRACTOR, dedup))
+
+    # claims of every unfinished row up front, LLM fallbacks concurrently
+    # (joint mode extracts inside its verification call)
+    pending = df[~df["id"].astype(str).isin(load_results(out_path))]
+    if classify_mode == "joint":
+        pending = pending.iloc[:0]
+    prefetched = dict(zip(pending["backstory"].astype(str),
+                          claims.extract_column(pending, "backstory")))
+
+    def extract_fn(text):
+        # a failed prefetch ([]) is retried strictly: an outage must not look like "no claims"
+        return prefetched.get(text) or claims.extract_claims(text, strict=True)
+
+    rows = zip(df["id"], df["backstory"])
+    for p in run_batch(chunks, rows, out_path, story_name, k=k, alpha=0.6,
+                       chunk_params=chunk_params(), classify_mode=classify_mode,
+                       extract_fn=extract_fn, dedup=dedup, backend=backend, rerank=rerank):
+        yield p
+
+def process_story_with_backstories(story_path, backstory_csv, story_name, classify_mode="batch",
+                                   dedup=True, backend="llm", rerank=False):
+    results, stats, gate_stats, ev_stats = [], {}, {}, {}
+    failed = 0
+    for p in iter_story_with_backstories(story_path, backstory_csv, story_name, classify_mode,
+                                         dedup, backend, rerank):
+        rec = p["record"]
+        tag = "cached" if p["skipped"] else f"failed ({rec['error']})" if p["failed"] \
+            else rec["prediction"]
+        print(f"[{story_name} {p['done']}/{p['total']}] {rec['backstory_id']} → {tag}")
+        if p["failed"]:
+            failed += 1
+        else:
+            results.append(rec)
+        stats, gate_stats, ev_stats = p["dedup"], p["gate"], p["evidence"]
+    if failed:
+        print(f"⚠️ {story_name}: {failed} backstories failed (LLM errors), not saved; "
+              "rerun to retry them")
+    if gate_stats.get("checked"):
+        print(f"⏭️ {story_name}: {gate_stats['unknown'] + gate_stats['nli']}/{gate_stats['checked']} "
+              "claims skipped the LLM (no relevant evidence)")
+    if ev_stats.get("tokens_before"):
+        print(f"✂️ {story_name}: evidence {ev_stats['tokens_before']} → {ev_stats['tokens_after']} "
+              "prompt tokens")
+    if stats.get("claims"):
+        reused = stats["exact_reuse"] + stats["semantic_reuse"]
+        print(f"♻️ {story_name}: {reused}/{stats['claims']} claims reused "
+              f"({stats['exact_reuse']} exact, {stats['semantic_reuse']} semantic)")
     return results
 
 
 def main():
-    all_results = []
-
-    all_results += process_story_with_backstories(
-        "data/stories/story1.txt",
-        "data/backstories/backstory1.csv",
-        "story1"
-    )
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--classify", choices=["batch", "per-claim", "joint"], default="batch",
+                    help="several claims per LLM call, one call per claim, or one call that "
+                         "extracts and labels the claims of a backstory")
+    ap.add_argument("--backend", choices=["llm", "nli"], default="llm",
+                    help="OpenRouter LLM, or the local CPU NLI cross-encoder (offline)")
+    ap.add_argument("--rerank", action="store_true",
+                    help="re-rank the top hybrid hits with a cross-encoder and keep 3 instead of 5")
+    ap.add_argument("--no-dedup", action="store_true",
+                    help="resolve every claim even if an earlier backstory had a near-duplicate")
+    ap.add_argument("--extractor", choices=claims.CLAIM_EXTRACTORS, default=claims.CLAIM_EXTRACTOR,
+                    help="claim extraction: LLM, local CPU only, or local with LLM fallback")
+    ap.add_argument("--profile", action="store_true",
+                    help=f"print per-stage timings and LLM stats (always logged to {tracing.TRACE_LOG})")
+    args = ap.parse_args()
+    claims.CLAIM_EXTRACTOR = args.extractor
 
-    all_results += process_story_with_backstories(
-        "data/stories/story2.txt",
-        "data/backstories/backstory2.csv",
-        "story2"
-    )
-
-    out = pd.DataFrame(all_results)
+    all_results = []
+    t0 = time.perf_counter()
+
+    with tracing.run("hackathon", backend=args.backend, classify=args.classify,
+                     rerank=args.rerank) as trace:
+        all_results += process_story_with_backstories(
+            "data/stories/story1.txt",
+            "data/backstories/backstory1.csv",
+            "story1",
+            args.classify,
+            not args.no_dedup,
+            args.backend,
+            args.rerank,
+        )
+
+        all_results += process_story_with_backstories(
+            "data/stories/story2.txt",
+            "data/backstories/backstory2.csv",
+            "story2",
+            args.classify,
+            not args.no_dedup,
+            args.backend,
+            args.rerank,
+        )
+
+    elapsed = time.perf_counter() - t0
+    print(f"⏱️ {len(all_results)} backstories in {elapsed:.1f}s ({args.backend}, {args.classify})")
+    if args.profile:
+        print(tracing.format_summary(trace.summary()))
+
+    out = pd.DataFrame(all_results)[["story", "backstory_id", "prediction", "confidence"]]
     out.to_csv("results/hackathon_submission.csv", index=False)
 
     print("✅ hackathon_submission.csv created")
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,60 @@
+import numpy as np
+
+# -----------------------------
+# Refit-free TF-IDF
+#
+# Terms are hashed into a fixed feature space (no vocabulary to fit), so the
+# raw term counts of a chunk never change once computed. Editing a story only
+# recounts the edited chunks; IDF is recomputed from document frequencies,
+# which is a single pass over the non-zeros. Tokenisation and weighting match
+# TfidfVectorizer(stop_words="english") with smooth IDF and L2 norm.
+# -----------------------------
+N_FEATURES = 2 ** 18
+
+_hasher = None
+def _get_hasher():
+    global _hasher
+    if _hasher is None:
+        from sklearn.feature_extraction.text import HashingVectorizer
+        _hasher = HashingVectorizer(
+            n_features=N_FEATURES,
+            stop_words="english",
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32,
+        )
+    return _hasher
+
+def term_counts(texts):
+    """CSR (len(texts) x N_FEATURES) raw term counts."""
+    return _get_hasher().transform(list(texts)).tocsr()
+
+def idf_from_counts(counts):
+    n_docs = counts.shape[0]
+    df = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = np.log((1 + n_docs) / (1 + df)) + 1
+    # terms no chunk contains are out of vocabulary: drop them from queries
+    idf[df == 0] = 0
+    return idf.astype(np.float32)
+
+def _l2_rows(m):
+    m = m.tocsr()
+    norms = np.sqrt(np.asarray(m.multiply(m).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    inv = np.repeat(1.0 / norms, np.diff(m.indptr)).astype(np.float32)
+    m.data = m.data * inv
+    return m
+
+class HashedTfidf:
+    """Query-side transform for a matrix built by weigh()."""
+
+    def __init__(self, idf):
+        self.idf = idf
+
+    def weigh(self, counts):
+        counts = counts.tocsr().astype(np.float32)
+        counts.data = counts.data * self.idf[counts.indices]
+        return _l2_rows(counts)
+
+    def transform(self, texts):
+        return self.weigh(term_counts(texts))
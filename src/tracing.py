@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+import numpy as np
+
+# -----------------------------
+# Lightweight run tracing
+#
+#     with tracing.run("hackathon", story="story1") as t:
+#         ...                              # stages below record into t
+#     print(tracing.format_summary(t.summary()))
+#
+# Pipeline code marks stages with `with tracing.stage("retrieve"):` or
+# @tracing.traced("retrieve") (stages may nest); the LLM client reports
+# latency, cache hits, retries, 429s and token counts.
+# Outside a run every hook is a no-op. The active run follows the context
+# (contextvars), so concurrent jobs in one process trace separately; pool
+# threads must be started with the caller's context (see llm_client).
+# Finished runs are appended to TRACE_LOG as one JSON line each.
+# -----------------------------
+TRACE_LOG = os.getenv("TRACE_LOG", os.path.join(".cache", "traces.jsonl"))
+
+COUNTERS = ("llm_requests", "cache_hits", "retries", "http_429", "errors",
+            "prompt_tokens", "completion_tokens")
+
+_current = contextvars.ContextVar("trace", default=None)
+_log_lock = threading.Lock()
+
+
+def _pct(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 1) if values else None
+
+
+class Trace:
+    def __init__(self, name, **meta):
+        self.name = name
+        self.meta = meta
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.stages = {}      # name -> [seconds]
+        self.latencies = []   # seconds per LLM HTTP round trip
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages.setdefault(name, []).append(seconds)
+
+    def add_latency(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def count(self, **increments):
+        with self._lock:
+            for key, n in increments.items():
+                self.counters[key] = self.counters.get(key, 0) + n
+
+    def summary(self):
+        with self._lock:
+            stages = {
+                name: {
+                    "calls": len(ts),
+                    "total_s": round(sum(ts), 3),
+                    "mean_ms": round(sum(ts) / len(ts) * 1000, 1),
+                    "p95_ms": _pct(ts, 95),
+                }
+                for name, ts in self.stages.items()
+            }
+            c = dict(self.counters)
+            lat = list(self.latencies)
+
+        return {
+            "run": self.name,
+            **self.meta,
+            "started_at": round(self.started_at, 3),
+            "wall_s": round(time.perf_counter() - self._t0, 3),
+            "stages": stages,
+            "llm": {
+                **c,
+                "cache_hit_rate": round(c["cache_hits"] / c["llm_requests"], 3) if c["llm_requests"] else None,
+                "http_calls": len(lat),
+                "p50_ms": _pct(lat, 50),
+                "p95_ms": _pct(lat, 95),
+                "p99_ms": _pct(lat, 99),
+            },
+        }
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def run(name, log=True, **meta):
+    """Trace everything inside; the summary is appended to TRACE_LOG on exit."""
+    t = Trace(name, **meta)
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+        if log:
+            write(t.summary())
+
+
+@contextmanager
+def stage(name):
+    t = _current.get()
+    if t is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        t.add_stage(name, time.perf_counter() - t0)
+
+
+def traced(name):
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def count(**increments):
+    t = _current.get()
+    if t is not None:
+        t.count(**increments)
+
+
+def llm_latency(seconds):
+    t = _current.get()
+    if t is not None:
+        t.add_latency(seconds)
+
+
+def write(summary, path=None):
+    path = path or TRACE_LOG
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    line = json.dumps(summary, ensure_ascii=False, default=str) + "\n"
+    with _log_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def format_summary(s):
+    """Plain-text report of a summary() for the CLIs."""
+    lines = [f"⏱️ {s['run']}: {s['wall_s']:.1f}s wall"]
+    for name, st in sorted(s["stages"].items(), key=lambda kv: -kv[1]["total_s"]):
+        lines.append(f"   {name:<16} {st['total_s']:8.2f}s  {st['calls']:5d} calls  "
+                     f"mean {st['mean_ms']:.1f} ms  p95 {st['p95_ms']:.1f} ms")
+    llm = s["llm"]
+    if llm["llm_requests"]:
+        hit = f"{llm['cache_hit_rate']:.0%}" if llm["cache_hit_rate"] is not None else "-"
+        lines.append(f"   LLM {llm['llm_requests']} requests, cache hits {hit}, "
+                     f"{llm['http_calls']} HTTP calls, {llm['retries']} retries, "
+                     f"{llm['http_429']} × 429, {llm['errors']} errors")
+        if llm["http_calls"]:
+            lines.append(f"   LLM latency p50 {llm['p50_ms']} ms  p95 {llm['p95_ms']} ms  "
+                         f"p99 {llm['p99_ms']} ms; tokens {llm['prompt_tokens']} in / "
+                         f"{llm['completion_tokens']} out")
+    return "\n".join(lines)
@@ -0,0 +1,142 @@
+import os
+import numpy as np
+
+# -----------------------------
+# Pluggable dense vector indexes
+#
+#   exact  brute-force dot product (default, no extra deps)
+#   hnsw   hnswlib graph index       pip install hnswlib
+#   ivf    faiss IVF-Flat            pip install faiss-cpu
+#
+# All indexes work on L2-normalised vectors, so inner product == cosine.
+# search(q, n) -> (scores, ids), both shaped (len(q), n), best first.
+# -----------------------------
+INDEX_KINDS = ("exact", "hnsw", "ivf")
+
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+
+
+def _l2_normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def _top_n(scores, n):
+    n = min(n, scores.shape[1])
+    part = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return np.take_along_axis(part_scores, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+class ExactIndex:
+    kind = "exact"
+
+    def __init__(self, vecs):
+        self.vecs = _l2_normalize(vecs)
+
+    def search(self, q, n):
+        return _top_n(_l2_normalize(q) @ self.vecs.T, n)
+
+    def save(self, path):
+        pass  # nothing beyond the embeddings themselves
+
+    @classmethod
+    def load(cls, path, vecs):
+        return cls(vecs)
+
+
+class HNSWIndex:
+    kind = "hnsw"
+
+    def __init__(self, vecs=None, index=None):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("hnsw index needs hnswlib: pip install hnswlib") from e
+
+        if index is None:
+            vecs = _l2_normalize(vecs)
+            index = hnswlib.Index(space="ip", dim=vecs.shape[1])
+            index.init_index(max_elements=len(vecs), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+            index.add_items(vecs, np.arange(len(vecs)))
+        self.index = index
+
+    def search(self, q, n):
+        n = min(n, self.index.get_current_count())
+        self.index.set_ef(max(HNSW_EF_SEARCH, n))
+        ids, dist = self.index.knn_query(_l2_normalize(q), k=n)
+        # hnswlib "ip" distance is 1 - <q, x>
+        return 1.0 - dist, ids.astype(np.int64)
+
+    def save(self, path):
+        self.index.save_index(path)
+
+    @classmethod
+    def load(cls, path, vecs):
+        import hnswlib
+        index = hnswlib.Index(space="ip", dim=vecs.shape[1])
+        index.load_index(path, max_elements=len(vecs))
+        return cls(index=index)
+
+
+class IVFIndex:
+    kind = "ivf"
+
+    def __init__(self, vecs=None, index=None):
+        try:
+            import faiss
+        except ImportError as e:
+            raise ImportError("ivf index needs faiss: pip install faiss-cpu") from e
+
+        if index is None:
+            vecs = _l2_normalize(vecs)
+            # ~39 training points per centroid keeps faiss k-means happy
+            nlist = max(1, min(int(4 * np.sqrt(len(vecs))), len(vecs) // 39))
+            quantizer = faiss.IndexFlatIP(vecs.shape[1])
+            index = faiss.IndexIVFFlat(quantizer, vecs.shape[1], nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(vecs)
+            index.add(vecs)
+        self.index = index
+
+    def search(self, q, n):
+        self.index.nprobe = min(IVF_NPROBE, self.index.nlist)
+        scores, ids = self.index.search(_l2_normalize(q), min(n, self.index.ntotal))
+        return scores, ids.astype(np.int64)
+
+    def save(self, path):
+        import faiss
+        faiss.write_index(self.index, path)
+
+    @classmethod
+    def load(cls, path, vecs):
+        import faiss
+        return cls(index=faiss.read_index(path))
+
+
+_CLASSES = {"exact": ExactIndex, "hnsw": HNSWIndex, "ivf": IVFIndex}
+
+
+def build_index(kind, vecs):
+    if kind not in _CLASSES:
+        raise ValueError(f"Unknown vector index '{kind}', expected one of {INDEX_KINDS}")
+    return _CLASSES[kind](vecs)
+
+
+def load_or_build(kind, vecs, path):
+    """Load a persisted index from path, or build it and save it there."""
+    cls = _CLASSES.get(kind)
+    if cls is None:
+        raise ValueError(f"Unknown vector index '{kind}', expected one of {INDEX_KINDS}")
+    if kind != "exact" and os.path.exists(path):
+        return cls.load(path, vecs)
+    index = cls(vecs)
+    if kind != "exact":
+        tmp = f"{path}.{os.getpid()}.tmp"
+        index.save(tmp)
+        os.replace(tmp, path)
+    return index